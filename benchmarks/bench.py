@@ -0,0 +1,249 @@
+#!/usr/bin/env python3
+"""Time and memory-profile convert, compile and round trips on synthetic projects.
+
+    python benchmarks/bench.py                      # run and compare with baselines.json
+    python benchmarks/bench.py --profile large --save
+
+Wall times are the median, fastest and standard deviation of ``--repeat``
+runs; regressions are judged on the fastest, which is the least noisy.
+A case regresses when it is ``--threshold`` times slower, or ``--noise``
+baseline standard deviations slower if that is more, so short jittery
+cases get a wider margin than long steady ones. Shared machines slow
+down for minutes at a time, so every case also times a fixed calibration
+workload right before it and the baseline is scaled up by how much
+slower that got. Peak memory comes from one
+extra run under tracemalloc, so it counts Python allocations only. Compare
+numbers from the same machine; baselines.json records where it was made.
+"""
+import argparse
+import contextlib
+import gc
+import io
+import json
+import os
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+import zlib
+from pathlib import Path
+
+HERE = Path(__file__).resolve().parent
+sys.path.insert(0, str(HERE.parent / "src"))
+sys.path.insert(0, str(HERE))
+
+from generate import write_project  # noqa: E402
+from scratch2json.modules.compile_project.compile import ReconstructProject  # noqa: E402
+from scratch2json.modules.convert_project.convert_project import ConvertProject  # noqa: E402
+
+BASELINES = HERE / "baselines.json"
+
+PROFILES = {
+    "small": {"sprites": 5, "blocks": 100, "list_length": 100, "assets": 1, "asset_size": 4 * 1024},
+    "medium": {"sprites": 30, "blocks": 500, "list_length": 1000, "assets": 2, "asset_size": 32 * 1024},
+    "large": {"sprites": 100, "blocks": 2000, "list_length": 5000, "assets": 4, "asset_size": 128 * 1024},
+}
+
+
+def convert(sb3, prj, jobs, stream=False):
+    ck = ConvertProject(jobs=jobs)
+    if not ck.convert(prj, sb3, clear=True, stream=stream):
+        raise ck.error
+
+
+def compile_(prj, out, jobs):
+    ReconstructProject(jobs=jobs).reconstruct(structured_project_path=prj, output_dir=out)
+
+
+def cases(sb3, work, jobs):
+    """name -> (setup, run); only ``run`` is measured."""
+    prj = work / "prj"
+    out = work / "out"
+
+    def fresh():
+        shutil.rmtree(prj, ignore_errors=True)
+
+    def converted():
+        if not (prj / "stage").exists():
+            convert(sb3, prj, jobs)
+
+    def cold():
+        converted()
+        shutil.rmtree(prj / "builddir", ignore_errors=True)
+
+    return {
+        "convert": (fresh, lambda: convert(sb3, prj, jobs)),
+        "convert_stream": (fresh, lambda: convert(sb3, prj, jobs, stream=True)),
+        "compile_cold": (cold, lambda: compile_(prj, out, jobs)),
+        # second compile of an unchanged project, served from the build cache
+        "compile_warm": (converted, lambda: compile_(prj, out, jobs)),
+        "roundtrip": (fresh, lambda: (convert(sb3, prj, jobs), compile_(prj, out, jobs))),
+    }
+
+
+CALIBRATION_DATA = json.dumps({"items": [{"id": i, "name": f"item {i}", "values": list(range(20))}
+                                         for i in range(2000)]})
+
+
+def calibrate(work, rounds=5):
+    """Fastest time of a fixed parse/serialize/deflate/write workload,
+    roughly what convert and compile spend their time on."""
+    times = []
+    for _ in range(rounds):
+        started = time.perf_counter()
+        data = zlib.compress(json.dumps(json.loads(CALIBRATION_DATA), indent=4).encode("utf-8"), 6)
+        (work / "calibration.bin").write_bytes(data)
+        times.append(time.perf_counter() - started)
+    return min(times)
+
+
+def measure(setup, run, repeat, work):
+    calibration = calibrate(work)
+    times = []
+    with contextlib.redirect_stdout(io.StringIO()):
+        for _ in range(repeat):
+            setup()
+            gc.collect()
+            started = time.perf_counter()
+            run()
+            times.append(time.perf_counter() - started)
+
+        setup()
+        gc.collect()
+        tracemalloc.start()
+        try:
+            run()
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+    return {
+        "median_s": round(statistics.median(times), 4),
+        "min_s": round(min(times), 4),
+        "stdev_s": round(statistics.stdev(times), 4) if len(times) > 1 else 0.0,
+        "peak_mb": round(peak / (1024 * 1024), 2),
+        "calibration_s": round(calibration, 5),
+    }
+
+
+def run_profile(name, repeat, jobs, only=None):
+    with tempfile.TemporaryDirectory(prefix=f"s2j-bench-{name}-") as tmp:
+        work = Path(tmp)
+        sb3 = write_project(work / "project.sb3", **PROFILES[name])
+        results = {"sb3_bytes": os.path.getsize(sb3), "cases": {}}
+        for case, (setup, run) in cases(sb3, work, jobs).items():
+            if only and case not in only:
+                continue
+            results["cases"][case] = measure(setup, run, repeat, work)
+            r = results["cases"][case]
+            print(f"  {case:<15} {r['median_s']:>9.4f}s  (min {r['min_s']:.4f}s)  peak {r['peak_mb']:>8.2f} MB")
+        return results
+
+
+def machine():
+    return {
+        "platform": platform.platform(),
+        "python": platform.python_version(),
+        "cpus": os.cpu_count(),
+    }
+
+
+def time_limit(then, threshold, noise):
+    """Slowest time ratio ``then`` allows: ``threshold``, or ``noise``
+    standard deviations of its runs if that is more."""
+    if then.get("stdev_s") and then["min_s"]:
+        return max(threshold, 1 + noise * then["stdev_s"] / then["min_s"])
+    return threshold
+
+
+def judge(now, then, threshold, noise):
+    """``(time ratio, memory ratio, regressed)`` of one case against its baseline."""
+    expected = then["min_s"]
+    if now.get("calibration_s") and then.get("calibration_s"):
+        # a machine that got slower as a whole is not a regression; the
+        # calibration is noisy too, so a faster one never tightens the baseline
+        expected *= max(1.0, now["calibration_s"] / then["calibration_s"])
+    # the fastest run is the least noisy
+    ratio = now["min_s"] / expected if expected else 1.0
+    mem = now["peak_mb"] / then["peak_mb"] if then["peak_mb"] else 1.0
+    return ratio, mem, ratio > time_limit(then, threshold, noise) or mem > threshold
+
+
+def recheck(name, results, baseline, args):
+    """Run cases that look regressed once more and keep the better result,
+    so one noisy batch of runs does not fail the gate."""
+    suspects = [case for case, now in results["cases"].items()
+                if case in baseline.get("cases", {})
+                and judge(now, baseline["cases"][case], args.threshold, args.noise)[2]]
+    if not suspects:
+        return
+    print(f"  re-running {', '.join(suspects)} to rule out noise")
+    again = run_profile(name, args.repeat, args.jobs, suspects)
+    for case in suspects:
+        then = baseline["cases"][case]
+        now, rerun = results["cases"][case], again["cases"][case]
+        if judge(rerun, then, args.threshold, args.noise)[:2] < judge(now, then, args.threshold, args.noise)[:2]:
+            results["cases"][case] = rerun
+
+
+def compare(name, results, baseline, threshold, noise):
+    """Print slowdowns against the baseline; returns how many cases regressed."""
+    regressed = 0
+    for case, now in results["cases"].items():
+        then = baseline.get("cases", {}).get(case)
+        if then is None:
+            continue
+        ratio, mem, bad = judge(now, then, threshold, noise)
+        flag = ""
+        if bad:
+            flag = "  <-- regression"
+            regressed += 1
+        limit = time_limit(then, threshold, noise)
+        print(f"  {name}/{case:<15} time x{ratio:.2f} (limit x{limit:.2f})  memory x{mem:.2f}{flag}")
+    return regressed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="scratch2json benchmarks")
+    parser.add_argument("--profile", action="append", choices=sorted(PROFILES), help="project size to run (repeatable, default: small and medium)")
+    parser.add_argument("--case", action="append", help="only run these cases")
+    parser.add_argument("--repeat", type=int, default=9, help="timed runs per case")
+    parser.add_argument("--jobs", type=int, default=1, help="--jobs passed to convert and compile")
+    parser.add_argument("--save", action="store_true", help="store the results as the new baselines")
+    parser.add_argument("--threshold", type=float, default=1.25, help="ratio over the baseline that counts as a regression")
+    parser.add_argument("--noise", type=float, default=3, help="baseline standard deviations a case may slow down by, when more than --threshold")
+    args = parser.parse_args()
+
+    profiles = args.profile or ["small", "medium"]
+    baselines = json.loads(BASELINES.read_text(encoding="utf-8")) if BASELINES.exists() else {}
+    print(f"python {platform.python_version()} on {platform.platform()}, jobs={args.jobs}")
+
+    results = {}
+    for name in profiles:
+        print(f"\n{name}: {PROFILES[name]}")
+        results[name] = run_profile(name, args.repeat, args.jobs, args.case)
+        if not args.save and name in baselines.get("profiles", {}):
+            recheck(name, results[name], baselines["profiles"][name], args)
+
+    regressed = 0
+    if baselines.get("profiles"):
+        print(f"\ncompared with baselines from {baselines.get('machine', {}).get('platform', '?')}:")
+        for name, result in results.items():
+            if name in baselines["profiles"]:
+                regressed += compare(name, result, baselines["profiles"][name], args.threshold, args.noise)
+
+    if args.save:
+        profiles_saved = baselines.get("profiles", {})
+        profiles_saved.update({name: dict(result, options=PROFILES[name]) for name, result in results.items()})
+        BASELINES.write_text(json.dumps({"machine": machine(), "jobs": args.jobs, "repeat": args.repeat,
+                                         "profiles": profiles_saved}, indent=4) + "\n", encoding="utf-8")
+        print(f"\nsaved baselines to {BASELINES}")
+    elif regressed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
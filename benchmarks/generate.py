@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+"""Generate synthetic Scratch projects of a given size for benchmarking.
+
+    python benchmarks/generate.py big.sb3 --sprites 100 --blocks 2000 --list-length 5000
+
+The same arguments (and seed) always give a byte-identical project.
+"""
+import argparse
+import hashlib
+import json
+import random
+import struct
+import zipfile
+
+OPCODES = [
+    ("motion_movesteps", {"STEPS": [1, [4, "10"]]}, {}),
+    ("motion_turnright", {"DEGREES": [1, [4, "15"]]}, {}),
+    ("looks_sayforsecs", {"MESSAGE": [1, [10, "hello"]], "SECS": [1, [4, "2"]]}, {}),
+    ("control_wait", {"DURATION": [1, [5, "1"]]}, {}),
+    ("data_setvariableto", {"VALUE": [1, [10, "0"]]}, {"VARIABLE": "var"}),
+    ("data_changevariableby", {"VALUE": [1, [4, "1"]]}, {"VARIABLE": "var"}),
+    ("data_addtolist", {"ITEM": [1, [10, "thing"]]}, {"LIST": "list"}),
+    ("event_broadcast", {"BROADCAST_INPUT": "broadcast"}, {}),
+]
+
+
+def svg(rng, size):
+    parts = ['<svg xmlns="http://www.w3.org/2000/svg" width="100" height="100">']
+    length = len(parts[0])
+    while length < size - 6:
+        x, y, r = rng.randrange(100), rng.randrange(100), rng.randrange(1, 50)
+        parts.append(f'<circle cx="{x}" cy="{y}" r="{r}" fill="#{rng.randrange(1 << 24):06x}"/>')
+        length += len(parts[-1])
+    parts.append("</svg>")
+    return "".join(parts).encode("utf-8")
+
+
+def wav(rng, size):
+    frames = max(0, size - 44) // 2
+    pcm = rng.randbytes(frames * 2)
+    header = b"RIFF" + struct.pack("<I", 36 + len(pcm)) + b"WAVE"
+    header += b"fmt " + struct.pack("<IHHIIHH", 16, 1, 1, 22050, 44100, 2, 16)
+    header += b"data" + struct.pack("<I", len(pcm))
+    return header + pcm
+
+
+def add_asset(assets, data, ext):
+    md5 = hashlib.md5(data).hexdigest()
+    assets[f"{md5}.{ext}"] = data
+    return md5
+
+
+def make_script(rng, prefix, length, variables, lists, broadcasts):
+    blocks = {}
+    ids = [f"{prefix}-{i}" for i in range(length)]
+    for i, block_id in enumerate(ids):
+        if i == 0:
+            opcode, inputs, fields = "event_whenflagclicked", {}, {}
+        else:
+            opcode, inputs, fields = rng.choice(OPCODES)
+        inputs = json.loads(json.dumps(inputs))
+        block_fields = {}
+        for name, kind in fields.items():
+            if kind == "var":
+                var_id = rng.choice(list(variables))
+                block_fields[name] = [variables[var_id][0], var_id]
+            else:
+                list_id = rng.choice(list(lists))
+                block_fields[name] = [lists[list_id][0], list_id]
+        if inputs.get("BROADCAST_INPUT") == "broadcast":
+            b_id = rng.choice(list(broadcasts))
+            inputs["BROADCAST_INPUT"] = [1, [11, broadcasts[b_id], b_id]]
+        blocks[block_id] = {
+            "opcode": opcode,
+            "next": ids[i + 1] if i + 1 < length else None,
+            "parent": ids[i - 1] if i else None,
+            "inputs": inputs,
+            "fields": block_fields,
+            "shadow": False,
+            "topLevel": i == 0,
+        }
+        if i == 0:
+            blocks[block_id]["x"] = rng.randrange(0, 2000)
+            blocks[block_id]["y"] = rng.randrange(0, 2000)
+    return blocks
+
+
+def make_target(rng, name, is_stage, blocks, assets, assets_per_target, asset_size, variables, lists, broadcasts,
+                layer_order):
+    costumes = []
+    sounds = []
+    for i in range(max(1, assets_per_target)):
+        md5 = add_asset(assets, svg(rng, asset_size), "svg")
+        costumes.append({
+            "name": f"costume{i + 1}",
+            "bitmapResolution": 1,
+            "dataFormat": "svg",
+            "assetId": md5,
+            "md5ext": f"{md5}.svg",
+            "rotationCenterX": 50,
+            "rotationCenterY": 50,
+        })
+    for i in range(assets_per_target):
+        md5 = add_asset(assets, wav(rng, asset_size), "wav")
+        sounds.append({
+            "name": f"sound{i + 1}",
+            "assetId": md5,
+            "dataFormat": "wav",
+            "rate": 22050,
+            "sampleCount": max(0, asset_size - 44) // 2,
+            "md5ext": f"{md5}.wav",
+        })
+
+    script_blocks = {}
+    script_length = 20
+    for n in range(0, blocks, script_length):
+        script_blocks.update(make_script(rng, f"{name}-s{n // script_length}", min(script_length, blocks - n),
+                                         variables, lists, broadcasts))
+
+    target = {
+        "isStage": is_stage,
+        "name": name,
+        "variables": dict(variables) if is_stage else {},
+        "lists": dict(lists) if is_stage else {},
+        "broadcasts": dict(broadcasts) if is_stage else {},
+        "blocks": script_blocks,
+        "comments": {},
+        "currentCostume": 0,
+        "costumes": costumes,
+        "sounds": sounds,
+        "volume": 100,
+        "layerOrder": layer_order,
+    }
+    if is_stage:
+        target.update({"tempo": 60, "videoTransparency": 50, "videoState": "on", "textToSpeechLanguage": None})
+    else:
+        target.update({
+            "visible": True,
+            "x": rng.randrange(-240, 240),
+            "y": rng.randrange(-180, 180),
+            "size": 100,
+            "direction": 90,
+            "draggable": False,
+            "rotationStyle": "all around",
+        })
+    return target
+
+
+def generate_project(sprites=10, blocks=200, list_length=100, assets=1, asset_size=4096, seed=0):
+    """Build a synthetic project; returns ``{member name: bytes}`` for an .sb3."""
+    rng = random.Random(seed)
+    files = {}
+
+    variables = {f"var-{i}": [f"variable {i}", rng.randrange(1000)] for i in range(10)}
+    lists = {f"list-{i}": [f"list {i}", [str(rng.randrange(1000)) for _ in range(list_length)]] for i in range(5)}
+    broadcasts = {f"broadcast-{i}": f"message {i}" for i in range(5)}
+
+    targets = [make_target(rng, "Stage", True, blocks, files, assets, asset_size, variables, lists, broadcasts, 0)]
+    for i in range(sprites):
+        targets.append(make_target(rng, f"Sprite{i + 1}", False, blocks, files, assets, asset_size,
+                                   variables, lists, broadcasts, i + 1))
+
+    project = {
+        "targets": targets,
+        "monitors": [],
+        "extensions": [],
+        "meta": {"semver": "3.0.0", "vm": "0.2.0", "agent": "scratch2json-benchmarks"},
+    }
+    files["project.json"] = json.dumps(project).encode("utf-8")
+    return files
+
+
+def write_project(path, **options):
+    files = generate_project(**options)
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as zf:
+        for name in sorted(files):
+            info = zipfile.ZipInfo(name, date_time=(1980, 1, 1, 0, 0, 0))
+            info.compress_type = zipfile.ZIP_DEFLATED
+            zf.writestr(info, files[name])
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description="generate a synthetic Scratch project")
+    parser.add_argument("out", help="path of the .sb3 to write")
+    parser.add_argument("--sprites", type=int, default=10, help="number of sprites (plus the stage)")
+    parser.add_argument("--blocks", type=int, default=200, help="blocks per target")
+    parser.add_argument("--list-length", type=int, default=100, help="items in each of the 5 lists")
+    parser.add_argument("--assets", type=int, default=1, help="costumes and sounds per target")
+    parser.add_argument("--asset-size", type=int, default=4096, help="approximate bytes per asset")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    write_project(args.out, sprites=args.sprites, blocks=args.blocks, list_length=args.list_length,
+                  assets=args.assets, asset_size=args.asset_size, seed=args.seed)
+    print(f"wrote {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""Check how long the CLI takes to start and what it imports on the way.
+
+    python benchmarks/startup.py
+    python benchmarks/startup.py --budget 0.05 --repeat 20
+
+Each command's time is measured over a bare ``python -c pass``, so the
+budget covers only what scratch2json itself adds. Exits 1 when a command
+goes over budget or imports a module it has no use for.
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+HERE = Path(__file__).resolve().parent
+
+# command -> top level modules it must not import
+COMMANDS = {
+    "about": {"flask", "flask_cors", "ijson", "zipfile", "concurrent"},
+    "--help": {"flask", "flask_cors", "ijson", "zipfile", "concurrent"},
+    "query --help": {"flask", "flask_cors", "ijson"},
+    "convert --help": {"flask", "flask_cors"},
+}
+
+# seconds on top of the bare interpreter
+DEFAULT_BUDGET = 0.1
+
+
+def env():
+    e = dict(os.environ)
+    e["PYTHONPATH"] = os.pathsep.join(filter(None, [str(HERE.parent / "src"), e.get("PYTHONPATH")]))
+    return e
+
+
+def run_time(args, repeat):
+    times = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        subprocess.run([sys.executable, *args], env=env(), stdout=subprocess.DEVNULL,
+                       stderr=subprocess.DEVNULL, check=False)
+        times.append(time.perf_counter() - started)
+    return statistics.median(times)
+
+
+def imported_modules(command):
+    result = subprocess.run([sys.executable, "-X", "importtime", "-m", "scratch2json.cli", *command.split()],
+                            env=env(), stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True, check=False)
+    modules = set()
+    for line in result.stderr.splitlines():
+        if line.startswith("import time:") and "|" in line:
+            modules.add(line.rsplit("|", 1)[1].strip().split(".")[0])
+    return modules
+
+
+def main():
+    parser = argparse.ArgumentParser(description="scratch2json startup benchmark")
+    parser.add_argument("--repeat", type=int, default=10, help="runs per command")
+    parser.add_argument("--budget", type=float, default=DEFAULT_BUDGET, help="allowed seconds over a bare interpreter")
+    args = parser.parse_args()
+
+    bare = run_time(["-c", "pass"], args.repeat)
+    print(f"bare interpreter: {bare * 1000:.1f} ms")
+
+    failed = 0
+    for command, forbidden in COMMANDS.items():
+        overhead = run_time(["-m", "scratch2json.cli", *command.split()], args.repeat) - bare
+        leaked = sorted(imported_modules(command) & forbidden)
+        problems = []
+        if overhead > args.budget:
+            problems.append(f"over the {args.budget * 1000:.0f} ms budget")
+        if leaked:
+            problems.append(f"imports {', '.join(leaked)}")
+        failed += bool(problems)
+        status = "FAIL " + "; ".join(problems) if problems else "ok"
+        print(f"  {command:<16} +{overhead * 1000:7.1f} ms  {status}")
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -11,9 +11,11 @@ class ChipS2J {
     constructor(runtime) {
         this.runtime = runtime;
         this.saveTimeout = null;
+        this.projectETag = null;
+        this.reloading = false;
         this.ping();
         this.runtime.on("PROJECT_CHANGED", () => {
-            this.scheduleSave();
+            if (!this.reloading) this.scheduleSave();
         });
     }
 
@@ -22,7 +24,13 @@ class ChipS2J {
             id: "S2J",
             name: "Scratch2Json",
             menuIconURI: IconURI,
-            blocks: []
+            blocks: [
+                {
+                    opcode: "reloadProject",
+                    blockType: Scratch.BlockType.COMMAND,
+                    text: "reload project from folder"
+                }
+            ]
         };
     }
 
@@ -63,6 +71,16 @@ class ChipS2J {
             return;
         }
 
+        // send only project.json and new assets when we can, else the whole thing
+        try {
+            if (await this.exportDelta(vm)) return;
+        } catch (err) {
+            console.warn("Delta upload failed, sending the full project: " + (err.message || err));
+        }
+        await this.exportFull(vm);
+    }
+
+    async exportFull(vm) {
         try {
             const blob = await vm.saveProjectSb3("blob");
             const formData = new FormData();
@@ -75,7 +93,8 @@ class ChipS2J {
 
             const result = await res.json();
             if (res.ok) {
-                console.log("Uploaded successfully: " + (result.msg || "Success"));
+                console.log("Upload queued as job " + result.job);
+                this.watchJob(result.job);
             } else {
                 console.warn("Upload failed: " + (result.error || "unknown error"));
             }
@@ -83,6 +102,114 @@ class ChipS2J {
             console.error("Error posting to backend: " + (err.message || err));
         }
     }
+
+    collectAssets(vm) {
+        const assets = new Map();
+        const add = (asset) => {
+            if (asset && asset.data) assets.set(asset.assetId + "." + asset.dataFormat, asset);
+        };
+        for (const asset of vm.assets || []) add(asset);
+        // TurboWarp/PenguinMod keep custom fonts outside vm.assets
+        const fonts = vm.runtime?.fontManager?.serializeAssets?.() || [];
+        for (const asset of fonts) add(asset);
+        return assets;
+    }
+
+    async exportDelta(vm) {
+        const assets = this.collectAssets(vm);
+
+        const check = await fetch(localhost + "/api/assets/missing", {
+            method: "POST",
+            headers: { "Content-Type": "application/json" },
+            body: JSON.stringify({ assets: [...assets.keys()] })
+        });
+        if (!check.ok) return false;
+        const { missing } = await check.json();
+
+        const formData = new FormData();
+        formData.append("project", new Blob([vm.toJSON()], { type: "application/json" }), "project.json");
+        for (const md5ext of missing) {
+            const asset = assets.get(md5ext);
+            if (!asset) return false;
+            formData.append(md5ext, new Blob([asset.data]), md5ext);
+        }
+
+        const res = await fetch(localhost + "/api/upload/delta", {
+            method: "POST",
+            body: formData
+        });
+        // 409 means the server still lacks something, e.g. it was cleaned up meanwhile
+        if (!res.ok) return false;
+
+        const result = await res.json();
+        console.log("Delta upload queued as job " + result.job + " (" + missing.length + " new assets)");
+        this.watchJob(result.job).then((status) => {
+            if (status === "failed") this.exportFull(vm);
+        });
+        return true;
+    }
+
+    async reloadProject() {
+        const vm = this.runtime?.vm || window.vm;
+        if (!vm) {
+            console.warn("VM instance not found! Are you in PenguinMod or TurboWarp?");
+            return;
+        }
+
+        try {
+            // the ETag makes an unchanged folder a cheap 304, no rebuild
+            const headers = this.projectETag ? { "If-None-Match": this.projectETag } : {};
+            const res = await fetch(localhost + "/api/project", { headers });
+            if (res.status === 304) {
+                console.log("Project folder unchanged, nothing to reload");
+                return;
+            }
+            if (!res.ok) {
+                const result = await res.json();
+                console.warn("Reload failed: " + (result.error || "unknown error"));
+                return;
+            }
+
+            const data = await res.arrayBuffer();
+            this.reloading = true;
+            try {
+                await vm.loadProject(data);
+            } finally {
+                this.reloading = false;
+            }
+            this.projectETag = res.headers.get("ETag");
+            console.log("Reloaded project from folder");
+        } catch (err) {
+            console.error("Error reloading project: " + (err.message || err));
+        }
+    }
+
+    async watchJob(jobId) {
+        // conversion runs in the background, so poll until it settles
+        try {
+            while (true) {
+                await new Promise((resolve) => setTimeout(resolve, 1000));
+                const res = await fetch(localhost + "/api/jobs/" + jobId);
+                if (!res.ok) return null;
+
+                const job = await res.json();
+                if (job.status === "done") {
+                    console.log("Converted in " + job.run_seconds + "s");
+                    return job.status;
+                }
+                if (job.status === "failed") {
+                    console.warn("Convert failed: " + (job.error || "unknown error"));
+                    return job.status;
+                }
+                if (job.status === "superseded") {
+                    return job.status;
+                }
+            }
+        } catch (err) {
+            console.error("Error checking job: " + (err.message || err));
+            return null;
+        }
+    }
 }
 
 Scratch.extensions.register(new ChipS2J(Scratch.vm.runtime));
@@ -1,21 +1,25 @@
 #!/usr/bin/env python3
 import os
-import platform
 import argparse
+import json
+import sys
 from scratch2json.modules.tui.tui import tui
-from scratch2json.modules.compile_project.compile import ReconstructProject
-from scratch2json.modules.convert_project.convert_project import ConvertProject
-from scratch2json.modules.backend.backend import app  
+from scratch2json.modules.profiling import profiling
 
-from threading import Thread
+# every command imports what it needs itself: Flask, ijson and the
+# converters cost more to import than a small project takes to convert
 
 tl = tui()
 
 def clear():
-    if platform.system() == "Windows":
+    # only worth doing for a person looking at a terminal
+    if not sys.stdout.isatty():
+        return
+    if os.name == "nt":
         os.system("cls")
     else:
-        os.system("clear")
+        sys.stdout.write("\033[H\033[2J\033[3J")
+        sys.stdout.flush()
 
 def server_cmd(dst, start=False):
     print("🚀 starting backend server for auto-convert...")
@@ -23,10 +27,9 @@ def server_cmd(dst, start=False):
     os.environ["SCRATCH2JSON_BACKEND_DST"] = dst
 
     if start:
+        from threading import Thread
+
         def run_flask():
-            import flask
-            from flask import Flask
-            import logging
             import scratch2json.modules.backend.backend as backend
             backend.app.run(host="0.0.0.0", port=5000, debug=False)
         
@@ -35,35 +38,34 @@ def server_cmd(dst, start=False):
     else:
         print("ℹ️  --start not passed, backend server not launched")
 
-def convert_cmd(src, dst):
+def convert_cmd(src, dst, stream=False, jobs=1, shared_assets=False, incremental=False, split_scripts=False):
+    from scratch2json.modules.convert_project.convert_project import ConvertProject
+
     if not src or not dst:
         print("🛑 missing paths 😭")
-        return
-    rc = ConvertProject()
-    rc.convert(dst, src)
+        return 1
+    rc = ConvertProject(jobs=jobs, shared_assets=shared_assets, split_scripts=split_scripts)
+    if not rc.convert(dst, src, stream=stream, incremental=incremental):
+        print(f"💔 convert failed: {rc.error}")
+        return 1
     print("✅ converted successfully!\n")
+    return 0
+
+def compile_cmd(src, dst, turbowarp=False, **build_options):
+    """``build_options`` are ReconstructProject's keyword arguments."""
+    from scratch2json.modules.compile_project.compile import ReconstructProject, TURBOWARP_META
 
-def compile_cmd(src, dst, turbowarp=False):
     if not src or not dst:
         print("🛑 missing paths 😭")
         return
 
-    rk = ReconstructProject()
+    rk = ReconstructProject(**build_options)
 
     if turbowarp:
-        turbowarp_meta = {
-            "semver": "3.0.0",
-            "vm": "0.2.0",
-            "agent": "",
-            "platform": {
-                "name": "TurboWarp",
-                "url": "https://turbowarp.org/"
-            }
-        }
         rk.reconstruct(
             structured_project_path=src,
             output_dir=dst,
-            meta_data=turbowarp_meta
+            meta_data=TURBOWARP_META
         )
         print("✅ compiled w/ TurboWarp meta 🌀")
     else:
@@ -73,42 +75,127 @@ def compile_cmd(src, dst, turbowarp=False):
         )
         print("✅ compiled w/o TurboWarp meta")
 
-def fastcompile_cmd(turbowarp=False):
-    src = os.getcwd()
-    dst = os.getcwd()
+def fastcompile_cmd(turbowarp=False, **build_options):
+    compile_cmd(os.getcwd(), os.getcwd(), turbowarp, **build_options)
 
-    rk = ReconstructProject()
+def watch_cmd(src, dst, turbowarp=False, debounce=0.3, poll=False, **build_options):
+    from scratch2json.modules.compile_project.compile import ReconstructProject, TURBOWARP_META
+    from scratch2json.modules.watch.watch import watch
 
-    if turbowarp:
-        turbowarp_meta = {
-            "semver": "3.0.0",
-            "vm": "0.2.0",
-            "agent": "",
-            "platform": {
-                "name": "TurboWarp",
-                "url": "https://turbowarp.org/"
-            }
-        }
-        rk.reconstruct(
-            structured_project_path=src,
-            output_dir=dst,
-            meta_data=turbowarp_meta
-        )
-        print("✅ compiled w/ TurboWarp meta 🌀")
-    else:
-        rk.reconstruct(
-            structured_project_path=src,
-            output_dir=dst
-        )
-        print("✅ compiled w/o TurboWarp meta")
+    if not src or not dst:
+        print("🛑 missing paths 😭")
+        return
+
+    rk = ReconstructProject(**build_options)
+    print("👀 watching for changes, ctrl+c to stop")
+    watch(src, dst, rk, meta_data=TURBOWARP_META if turbowarp else None, debounce=debounce, poll=poll)
+
+def batch_cmd(command, inputs, out, manifest=None, workers=None, **options):
+    """``options`` are the convert and build options every project gets."""
+    from scratch2json.modules.batch.batch import expand_inputs, run_batch
+
+    projects = expand_inputs(inputs, manifest)
+    if not projects:
+        # stdout only ever carries JSON lines in batch mode
+        print("🛑 no projects matched 😭", file=sys.stderr)
+        return 1
+
+    return run_batch(command, projects, out, workers=workers, options=options)
+
+def query_cmd(src, kind, key, as_json=False):
+    from scratch2json.modules.query.query import load_index, query
+
+    found = query(load_index(src), kind, key)
+    if as_json:
+        print(json.dumps(found, indent=4))
+        return
+
+    if not found:
+        print(f"🔍 nothing uses {key}")
+        return
+    for target, blocks in found.items():
+        print(f"🎯 {target}: {len(blocks)} block(s)")
+        for block_id in blocks:
+            print(f"   {block_id}")
+
+def verify_cmd(inputs, jobs=None, as_json=False, use_cache=True):
+    import glob
+    from scratch2json.modules.verify.verify import verify_project
+
+    projects = []
+    for pattern in inputs:
+        projects += sorted(glob.glob(pattern)) or [pattern]
+    projects = [p for p in projects if os.path.isdir(p)]
+    if not projects:
+        print("🛑 no projects matched 😭", file=sys.stderr if as_json else sys.stdout)
+        return 1
+
+    broken = 0
+    for prj in projects:
+        report = verify_project(prj, jobs=jobs, use_cache=use_cache)
+        broken += not report["ok"]
+        if as_json:
+            print(json.dumps(report))
+            continue
+        icon = "✅" if report["ok"] else "💔"
+        print(f"{icon} {prj}: {report['assets']} assets, {report['hashed']} hashed, {report['cached']} cached")
+        for entry in report["dangling"]:
+            print(f"   🕳️  missing {entry['md5ext']} ({entry['owner']} {entry['kind']})")
+        for entry in report["mismatched"]:
+            print(f"   ❌ {entry['md5ext']} ({entry['owner']} {entry['kind']}) hashes to {entry['md5']}")
+        for rel in report["orphaned"]:
+            print(f"   👻 orphaned {rel}")
+
+    if not as_json:
+        print(f"\n{len(projects) - broken}/{len(projects)} projects ok")
+    return broken
+
+def diff_cmd(a, b, as_json=False):
+    from scratch2json.modules.diff.diff import diff_paths
+
+    if not a or not b:
+        print("🛑 missing paths 😭")
+        return 1
+
+    report = diff_paths(a, b)
+    if as_json:
+        print(json.dumps(report, indent=4))
+        return 0 if report["identical"] else 1
+
+    if report["identical"]:
+        print("✅ no differences")
+        return 0
+
+    targets = report.get("targets", {})
+    for name in targets.get("added", []):
+        print(f"➕ target {name}")
+    for name in targets.get("removed", []):
+        print(f"➖ target {name}")
+    for name, changes in targets.get("changed", {}).items():
+        print(f"✏️  {name}")
+        for section, diff in changes.items():
+            counts = ", ".join(f"{len(keys)} {part}" for part, keys in diff.items())
+            print(f"   {section}: {counts}")
+            if section != "blocks":
+                for part, keys in diff.items():
+                    print(f"      {part}: {', '.join(str(k) for k in keys)}")
+    for section in ("assets", "extensions", "monitors", "fonts"):
+        for part, keys in report.get(section, {}).items():
+            print(f"📦 {section} {part}: {', '.join(str(k) for k in keys)}")
+    return 1
 
 def about_cmd():
     print("""
 scratch2json — CLI for converting and compiling Scratch projects
 ---------------------------------------------------------------
-• convert      : unzip .sb3 and save it as structured JSON + assets
+• convert      : read .sb3/.pmp (or extracted folder) and save it as structured JSON + assets
 • compile      : take structured project and rebuild a .sb3 file
 • fastcompile  : rebuild using current dir as input/output
+• watch        : recompile whenever the structured project changes
+• batch        : convert/compile many projects at once, one JSON line each
+• query        : find blocks by opcode, variable, list, broadcast or custom block
+• verify       : check that every asset exists and matches its md5
+• diff         : compare two projects by targets, blocks, variables and assets
 • server       : spin up Flask backend for auto converting ZIPs
 • --turbowarp  : optional flag to add TurboWarp-compatible meta
 • author       : dachip
@@ -116,14 +203,59 @@ scratch2json — CLI for converting and compiling Scratch projects
 • repo         : https://github.com/whoschip/scratch2github
 """)
 
+# ReconstructProject keywords, and ConvertProject.convert/batch keywords
+BUILD_OPTIONS = ("jobs", "json_level", "processes", "compact", "deterministic", "optimize")
+CONVERT_OPTIONS = ("stream", "shared_assets", "incremental", "split_scripts")
+
+def options(args, names):
+    """The ``names`` a subcommand has, out of ``args``, as keyword arguments."""
+    return {name: getattr(args, name) for name in names if hasattr(args, name)}
+
+# commands whose --json output must be nothing but JSON
+JSON_COMMANDS = {"query", "verify", "diff"}
+
+def machine_readable(args):
+    """True when stdout is meant for another program, so no banner."""
+    if args.command == "batch":
+        return True
+    if args.command in JSON_COMMANDS and args.json:
+        return True
+    # --profile - writes the trace to stdout
+    return getattr(args, "profile", None) == "-"
+
 def main():
     parser = argparse.ArgumentParser(prog="scratch2json", description="scratch project CLI")
+    parser.add_argument("--clear", action="store_true", help="clear the terminal before running")
     subparsers = parser.add_subparsers(dest="command", required=True)
 
+    # options shared between subcommands
+    profile_opts = argparse.ArgumentParser(add_help=False)
+    profile_opts.add_argument("--profile", metavar="TRACE", help="write per-phase and per-target timings as JSON to TRACE (- for stdout)")
+    profile_opts.add_argument("--quiet", action="store_true", help="skip the per-item progress lines")
+
+    convert_opts = argparse.ArgumentParser(add_help=False)
+    convert_opts.add_argument("--stream", action="store_true", help="parse project.json one target at a time to keep memory low")
+    convert_opts.add_argument("--shared-assets", action="store_true", help="store each asset once in a shared assets/ folder")
+    convert_opts.add_argument("--incremental", action="store_true", help="only rewrite files that changed since the last convert")
+    convert_opts.add_argument("--split-scripts", action="store_true", help="write one file per script instead of a single script.json")
+
+    build_opts = argparse.ArgumentParser(add_help=False)
+    build_opts.add_argument("--turbowarp", action="store_true", help="use TurboWarp meta")
+    build_opts.add_argument("--json-level", type=int, default=6, choices=range(0, 10), metavar="0-9", help="deflate level for project.json")
+    build_opts.add_argument("--compact", action="store_true", help="write project.json without indentation")
+    build_opts.add_argument("--deterministic", action="store_true", help="byte-identical output for the same tree (stable ids, fixed zip metadata)")
+    build_opts.add_argument("--optimize", action="store_true", help="minify svgs, recompress pngs and strip wav metadata in the output (cached in builddir)")
+
+    # batch runs one project per process, so it has none of these
+    compile_opts = argparse.ArgumentParser(add_help=False, parents=[build_opts])
+    compile_opts.add_argument("--jobs", type=int, default=1, help="number of assets to compress at once")
+    compile_opts.add_argument("--processes", action="store_true", help="parse sprites in worker processes instead of threads")
+
     # convert
-    convert_parser = subparsers.add_parser("convert", help="convert scratch project to JSON")
-    convert_parser.add_argument("src", help="path to extracted Scratch project")
+    convert_parser = subparsers.add_parser("convert", help="convert scratch project to JSON", parents=[convert_opts, profile_opts])
+    convert_parser.add_argument("src", help="path to .sb3/.pmp file or extracted Scratch project")
     convert_parser.add_argument("dst", help="path to save converted JSON")
+    convert_parser.add_argument("--jobs", type=int, default=1, help="number of assets to copy at once")
 
     # server
     server_parser = subparsers.add_parser("server", help="auto convert using a backend & ext")
@@ -131,14 +263,55 @@ def main():
     server_parser.add_argument("--start", action="store_true", help="start the backend server")
 
     # compile
-    compile_parser = subparsers.add_parser("compile", help="compile structured JSON to .sb3")
+    compile_parser = subparsers.add_parser("compile", help="compile structured JSON to .sb3", parents=[compile_opts, profile_opts])
     compile_parser.add_argument("src", help="path to structured project")
     compile_parser.add_argument("dst", help="path to save compiled .sb3")
-    compile_parser.add_argument("--turbowarp", action="store_true", help="use TurboWarp meta")
 
     # fastcompile
-    fastcompile_parser = subparsers.add_parser("fastcompile", help="input is the current folder, output is also the current folder")
-    fastcompile_parser.add_argument("--turbowarp", action="store_true", help="use TurboWarp meta")
+    subparsers.add_parser("fastcompile", help="input is the current folder, output is also the current folder",
+                          parents=[compile_opts, profile_opts])
+
+    # watch
+    watch_parser = subparsers.add_parser("watch", help="recompile to .sb3 every time the structured project changes",
+                                         parents=[compile_opts])
+    watch_parser.add_argument("src", help="path to structured project")
+    watch_parser.add_argument("dst", help="path to save compiled .sb3")
+    watch_parser.add_argument("--debounce", type=float, default=0.3, help="seconds to wait for a burst of writes to settle")
+    watch_parser.add_argument("--poll", action="store_true", help="poll for changes instead of using inotify")
+
+    # batch
+    batch_parser = subparsers.add_parser("batch", help="convert or compile many projects in one go",
+                                         parents=[build_opts, convert_opts])
+    batch_parser.add_argument("batch_command", choices=["convert", "compile"], help="what to run on every project")
+    batch_parser.add_argument("inputs", nargs="*", help="project paths or glob patterns")
+    batch_parser.add_argument("--manifest", help="file listing one project per line (path or {\"src\", \"dst\"} JSON)")
+    batch_parser.add_argument("--out", default=os.getcwd(), help="folder to put outputs in")
+    batch_parser.add_argument("--workers", type=int, default=None, help="number of worker processes (default: all cores)")
+
+    # query
+    query_parser = subparsers.add_parser("query", help="look up block references from block_index.json")
+    query_parser.add_argument("src", help="path to structured project")
+    query_group = query_parser.add_mutually_exclusive_group(required=True)
+    query_group.add_argument("--opcode", help="blocks with this opcode")
+    query_group.add_argument("--variable", help="blocks using this variable (id or name)")
+    query_group.add_argument("--list", help="blocks using this list (id or name)")
+    query_group.add_argument("--broadcast", help="blocks using this broadcast (id or name)")
+    query_group.add_argument("--procedure", help="blocks inside this custom block definition (proccode)")
+    query_group.add_argument("--calls", help="blocks calling this custom block (proccode)")
+    query_parser.add_argument("--json", action="store_true", help="print the result as JSON")
+
+    # verify
+    verify_parser = subparsers.add_parser("verify", help="check assets of structured projects exist and match their md5")
+    verify_parser.add_argument("inputs", nargs="+", help="structured project folders (globs allowed)")
+    verify_parser.add_argument("--jobs", type=int, default=None, help="files to hash at once (default: one per cpu)")
+    verify_parser.add_argument("--json", action="store_true", help="print one JSON report per project")
+    verify_parser.add_argument("--no-cache", action="store_true", help="rehash everything instead of trusting builddir/.verified.json")
+
+    # diff
+    diff_parser = subparsers.add_parser("diff", help="compare two projects (.sb3/.pmp or structured folders)")
+    diff_parser.add_argument("a", help="first project")
+    diff_parser.add_argument("b", help="second project")
+    diff_parser.add_argument("--json", action="store_true", help="print the differences as JSON")
 
     # about
     subparsers.add_parser("about", help="show info about this CLI tool")
@@ -146,22 +319,53 @@ def main():
     args = parser.parse_args()
 
     try:
-        clear()
-        tl.info()
+        if args.clear:
+            clear()
+        if not machine_readable(args):
+            tl.info()
         match args.command:
             case "convert":
-                convert_cmd(args.src, args.dst)
+                with profiling.session("convert", args.profile, args.quiet):
+                    failed = convert_cmd(args.src, args.dst, jobs=args.jobs, **options(args, CONVERT_OPTIONS))
+                if failed:
+                    sys.exit(1)
             case "compile":
-                compile_cmd(args.src, args.dst, args.turbowarp)
+                with profiling.session("compile", args.profile, args.quiet):
+                    compile_cmd(args.src, args.dst, args.turbowarp, **options(args, BUILD_OPTIONS))
             case "fastcompile":
-                fastcompile_cmd(args.turbowarp)
+                with profiling.session("fastcompile", args.profile, args.quiet):
+                    fastcompile_cmd(args.turbowarp, **options(args, BUILD_OPTIONS))
+            case "watch":
+                watch_cmd(args.src, args.dst, args.turbowarp, args.debounce, args.poll, **options(args, BUILD_OPTIONS))
             case "about":
                 about_cmd()
             case "server":
                 server_cmd(args.dst, args.start)
+            case "query":
+                for kind in ("opcode", "variable", "list", "broadcast", "procedure", "calls"):
+                    key = getattr(args, kind)
+                    if key is not None:
+                        plural = kind if kind == "calls" else kind + "s"
+                        query_cmd(args.src, plural, key, args.json)
+            case "verify":
+                if verify_cmd(args.inputs, args.jobs, args.json, not args.no_cache):
+                    sys.exit(1)
+            case "diff":
+                if diff_cmd(args.a, args.b, args.json):
+                    sys.exit(1)
+            case "batch":
+                failed = batch_cmd(args.batch_command, args.inputs, args.out, args.manifest, args.workers,
+                                   **options(args, ("turbowarp",) + BUILD_OPTIONS + CONVERT_OPTIONS))
+                if failed:
+                    sys.exit(1)
+        if getattr(args, "profile", None) and args.profile != "-":
+            print(f"📊 profile written to {args.profile}")
     except Exception as e:
-        print("💔 ayo something broke:")
-        print("👉", e)
+        # stdout may be half a JSON document already; keep it parseable
+        out = sys.stderr if machine_readable(args) else sys.stdout
+        print("💔 ayo something broke:", file=out)
+        print("👉", e, file=out)
+        sys.exit(1)
 
 if __name__ == "__main__":
     main()
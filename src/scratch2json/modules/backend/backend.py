@@ -1,12 +1,22 @@
+import os
 from flask import Flask
 from .routes import backend_bp
 from flask_cors import CORS
 
+# requests bigger than this are refused with a 413
+MAX_UPLOAD_SIZE = int(os.environ.get("SCRATCH2JSON_MAX_UPLOAD_MB", "1024")) * 1024 * 1024
+
+
 app = Flask(__name__)
+app.config["MAX_CONTENT_LENGTH"] = MAX_UPLOAD_SIZE
 CORS(app)
 
 app.register_blueprint(backend_bp, url_prefix='/api')
 
+@app.errorhandler(413)
+def too_large(e):
+    return {"error": f"project is over the {app.config['MAX_CONTENT_LENGTH'] // (1024 * 1024)} MB upload cap"}, 413
+
 @app.route("/")
 def home():
     return {"msg": "welcome, api goin brrrrr rn"}
@@ -0,0 +1,126 @@
+import itertools
+import threading
+import time
+from collections import OrderedDict, deque
+
+# finished jobs kept around for the status endpoint
+HISTORY = 100
+
+
+class Job:
+    def __init__(self, job_id, dst, run, payload):
+        self.id = job_id
+        self.dst = dst
+        self.run = run
+        self.payload = payload
+        self.status = "queued"
+        self.progress = "queued"
+        self.error = None
+        self.superseded_by = None
+        self.submitted = time.time()
+        self.started = None
+        self.finished = None
+
+    def release(self):
+        # payloads can be spooled temp files, close them as soon as we're done
+        if hasattr(self.payload, "close"):
+            self.payload.close()
+        self.payload = None
+
+    def to_dict(self):
+        info = {
+            "id": self.id,
+            "dst": self.dst,
+            "status": self.status,
+            "progress": self.progress,
+            "submitted": self.submitted,
+            "started": self.started,
+            "finished": self.finished,
+        }
+        if self.started is not None:
+            info["queued_seconds"] = round(self.started - self.submitted, 4)
+        if self.started is not None and self.finished is not None:
+            info["run_seconds"] = round(self.finished - self.started, 4)
+        if self.error is not None:
+            info["error"] = self.error
+        if self.superseded_by is not None:
+            info["superseded_by"] = self.superseded_by
+        return info
+
+
+class JobQueue:
+    """Runs uploads one at a time on a background thread.
+
+    Jobs for the same destination coalesce: while one is still waiting, a
+    newer save replaces it, so an autosave burst only converts the latest
+    project. A single worker also means two saves never write the same
+    output folder at once.
+    """
+
+    def __init__(self):
+        self.cond = threading.Condition()
+        self.ids = itertools.count(1)
+        self.jobs = OrderedDict()
+        self.pending = {}
+        self.order = deque()
+        self.worker = None
+
+    def submit(self, dst, run, payload=None):
+        """Queue ``run(job)`` for ``dst`` and return the new job right away."""
+        with self.cond:
+            job = Job(str(next(self.ids)), dst, run, payload)
+            self.jobs[job.id] = job
+
+            older = self.pending.get(dst)
+            if older is not None:
+                older.status = older.progress = "superseded"
+                older.superseded_by = job.id
+                older.finished = time.time()
+                older.release()
+            else:
+                self.order.append(dst)
+            self.pending[dst] = job
+
+            self._trim()
+            if self.worker is None or not self.worker.is_alive():
+                self.worker = threading.Thread(target=self._work, name="scratch2json-jobs", daemon=True)
+                self.worker.start()
+            self.cond.notify()
+            return job
+
+    def get(self, job_id):
+        with self.cond:
+            job = self.jobs.get(job_id)
+            return job.to_dict() if job is not None else None
+
+    def recent(self):
+        with self.cond:
+            return [job.to_dict() for job in self.jobs.values()]
+
+    def _trim(self):
+        done = [j for j in self.jobs.values() if j.status in ("done", "failed", "superseded")]
+        for job in done[:max(0, len(done) - HISTORY)]:
+            del self.jobs[job.id]
+
+    def _work(self):
+        while True:
+            with self.cond:
+                while not self.order:
+                    self.cond.wait()
+                dst = self.order.popleft()
+                job = self.pending.pop(dst)
+                job.status = "running"
+                job.started = time.time()
+
+            try:
+                job.run(job)
+                status, error = "done", None
+            except Exception as e:
+                status, error = "failed", f"{type(e).__name__}: {e}"
+
+            with self.cond:
+                job.status = status
+                job.progress = status
+                job.error = error
+                job.finished = time.time()
+                job.release()
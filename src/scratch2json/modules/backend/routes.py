@@ -1,11 +1,19 @@
+import hashlib
 import os
-import zipfile
 import io
-from flask import Blueprint, request, jsonify
+import zipfile
 from pathlib import Path
+from flask import Blueprint, Response, request, jsonify, send_file
 from scratch2json.modules.convert_project.convert_project import ConvertProject
+from scratch2json.modules.convert_project.source import DeltaSource, referenced_assets
+from scratch2json.modules.convert_project.writer import stored_assets
+from scratch2json.modules.serialize import serialize
+from .jobs import JobQueue
+from .served import ServedProject
 
 backend_bp = Blueprint("backend", __name__)
+jobs = JobQueue()
+served = ServedProject()
 
 @backend_bp.route("/fetch")
 def ping():
@@ -14,8 +22,6 @@ def ping():
 
 @backend_bp.route("/upload", methods=["POST"])
 def upload_zip():
-    ck = ConvertProject()
-
     if 'file' not in request.files:
         return {"error": "no file found "}, 400
 
@@ -28,10 +34,147 @@ def upload_zip():
     if not dst:
         return {"error": "bro no dst was passed from CLI"}, 500
 
-    with zipfile.ZipFile(io.BytesIO(zip_file.read())) as zip_ref:
-        builddir = Path(dst) / "builddir"
-        builddir.mkdir(parents=True, exist_ok=True)
-        zip_ref.extractall(builddir)
-        ck.convert(dst, builddir, clear=True)
+    upload = take_stream(zip_file)
+    if not zipfile.is_zipfile(upload):
+        upload.close()
+        return {"error": "that file ain't a valid zip 💀"}, 400
+    upload.seek(0)
+
+    job = jobs.submit(dst, convert_upload, upload)
+    return {"msg": "queued", "job": job.id, "status": job.status}, 202
+
+
+@backend_bp.route("/assets")
+def list_assets():
+    dst = os.environ.get("SCRATCH2JSON_BACKEND_DST")
+    if not dst:
+        return {"error": "bro no dst was passed from CLI"}, 500
+    return {"assets": sorted(stored_assets(dst))}
+
+
+@backend_bp.route("/assets/missing", methods=["POST"])
+def missing_assets():
+    dst = os.environ.get("SCRATCH2JSON_BACKEND_DST")
+    if not dst:
+        return {"error": "bro no dst was passed from CLI"}, 500
+
+    wanted = (request.get_json(silent=True) or {}).get("assets")
+    if not isinstance(wanted, list):
+        return {"error": "send {\"assets\": [md5ext, ...]}"}, 400
+
+    stored = stored_assets(dst)
+    return {"missing": [name for name in wanted if name not in stored]}
+
+
+@backend_bp.route("/upload/delta", methods=["POST"])
+def upload_delta():
+    """project.json plus only the assets the server doesn't have yet.
+
+    Every other file field is an asset named by its md5ext. Answers 409 with
+    the list of missing assets when something still has to be sent, so the
+    client can fall back to a full upload.
+    """
+    if "project" not in request.files:
+        return {"error": "no project.json found"}, 400
+
+    dst = os.environ.get("SCRATCH2JSON_BACKEND_DST")
+    if not dst:
+        return {"error": "bro no dst was passed from CLI"}, 500
 
-    return {"msg": f"converted to {builddir}"}
+    project = take_stream(request.files["project"])
+    uploads = {name: take_stream(f) for name, f in request.files.items() if name != "project"}
+    source = DeltaSource(project, uploads, {})
+
+    try:
+        project_data = serialize.load(project)
+    except ValueError as e:
+        source.close()
+        return {"error": f"project.json is broken: {e}"}, 400
+
+    for name, upload in uploads.items():
+        if md5_of(upload) != name.split(".")[0]:
+            source.close()
+            return {"error": f"{name} doesn't match its md5"}, 400
+
+    referenced = referenced_assets(project_data)
+    source.stored = {name: path for name, path in stored_assets(dst).items() if name in referenced}
+    missing = sorted(referenced - uploads.keys() - source.stored.keys())
+    if missing:
+        source.close()
+        return {"error": "assets missing", "missing": missing}, 409
+
+    job = jobs.submit(dst, convert_upload, source)
+    return {"msg": "queued", "job": job.id, "status": job.status, "sent": len(uploads)}, 202
+
+
+@backend_bp.route("/project")
+def get_project():
+    """The structured project compiled back into an .sb3.
+
+    Send the last ETag in If-None-Match to get a 304 (and no build) when
+    nothing changed. ``?turbowarp=1`` adds the TurboWarp meta.
+    """
+    dst = os.environ.get("SCRATCH2JSON_BACKEND_DST")
+    if not dst:
+        return {"error": "bro no dst was passed from CLI"}, 500
+    if not (Path(dst) / "stage").is_dir() and not (Path(dst) / "sprites").is_dir():
+        return {"error": "nothing converted yet"}, 404
+
+    turbowarp = request.args.get("turbowarp", "").lower() in ("1", "true", "yes")
+    etag = served.etag(dst, turbowarp)
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+    else:
+        etag, archive = served.get(dst, turbowarp)
+        response = send_file(archive, mimetype="application/x.scratch.sb3", as_attachment=True,
+                             download_name="project.sb3", etag=False)
+    response.set_etag(etag)
+    # always ask again, the 304 makes that cheap
+    response.headers["Cache-Control"] = "no-cache"
+    return response
+
+
+@backend_bp.route("/jobs")
+def list_jobs():
+    return {"jobs": jobs.recent()}
+
+
+@backend_bp.route("/jobs/<job_id>")
+def job_status(job_id):
+    job = jobs.get(job_id)
+    if job is None:
+        return {"error": "no such job"}, 404
+    return job
+
+
+def take_stream(file_storage):
+    """Detach the uploaded file from the request so it outlives it.
+
+    Flask closes every uploaded file when the request ends, but the job
+    reads it later on the worker thread.
+    """
+    stream = file_storage.stream
+    file_storage.stream = io.BytesIO()
+    return stream
+
+
+def md5_of(stream):
+    digest = hashlib.md5()
+    stream.seek(0)
+    for chunk in iter(lambda: stream.read(1024 * 1024), b""):
+        digest.update(chunk)
+    stream.seek(0)
+    return digest.hexdigest()
+
+
+def convert_upload(job):
+    # read straight out of the spooled upload (or delta), no extract step
+    ck = ConvertProject()
+    if isinstance(job.payload, DeltaSource):
+        # an earlier job may have cleaned up an asset this save relies on
+        gone = sorted(name for name in job.payload.stored if not job.payload.exists(name))
+        if gone:
+            raise FileNotFoundError(f"stored assets went away, upload the full project: {', '.join(gone)}")
+    job.progress = "converting"
+    if not ck.convert(job.dst, job.payload, clear=True, incremental=True):
+        raise ck.error
@@ -0,0 +1,65 @@
+import threading
+from pathlib import Path
+
+from scratch2json.modules.compile_project.cache import project_key
+from scratch2json.modules.compile_project.compile import ReconstructProject, TURBOWARP_META
+
+
+class ServedProject:
+    """Compiles the structured project on demand for ``GET /api/project``.
+
+    Builds are keyed on the path, size and mtime of every input file, and
+    that key doubles as the ETag. The newest build with and without the
+    TurboWarp meta is kept in ``builddir/served``, and the compiler's target
+    cache makes a rebuild after a small edit cheap.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.compiler = ReconstructProject()
+        # newest build per variant (with or without TurboWarp meta)
+        self.latest = {}
+
+    def etag(self, prj_home, turbowarp=False):
+        return project_key(prj_home, "turbowarp" if turbowarp else "")
+
+    def previous(self, served, turbowarp):
+        """The last build to copy unchanged members from.
+
+        Every build gets a new name, so point the compiler at the newest
+        one of this variant (or any, right after a restart).
+        """
+        last = self.latest.get(turbowarp)
+        if last is not None and (served / f"{last}.zip").exists():
+            return served / f"{last}.zip"
+        builds = sorted(served.glob("*.zip"), key=lambda p: p.stat().st_mtime_ns)
+        return builds[-1] if builds else None
+
+    def get(self, prj_home, turbowarp=False):
+        """Return ``(etag, path to the .sb3)``, building it if needed."""
+        served = Path(prj_home) / "builddir" / "served"
+        with self.lock:
+            # a convert job can write the folder while we read it, so only
+            # keep a build whose inputs did not move underneath it
+            for attempt in range(3):
+                etag = self.etag(prj_home, turbowarp)
+                archive = served / f"{etag}.zip"
+                if archive.exists():
+                    return etag, archive
+
+                served.mkdir(parents=True, exist_ok=True)
+                self.compiler.reconstruct(
+                    structured_project_path=prj_home,
+                    output_dir=served / etag,
+                    meta_data=TURBOWARP_META if turbowarp else None,
+                    previous=self.previous(served, turbowarp),
+                )
+                if attempt == 2 or self.etag(prj_home, turbowarp) == etag:
+                    break
+                archive.unlink(missing_ok=True)
+
+            self.latest[turbowarp] = etag
+            for old in served.glob("*.zip"):
+                if old.stem not in self.latest.values():
+                    old.unlink(missing_ok=True)
+            return etag, archive
@@ -0,0 +1,135 @@
+import contextlib
+import glob
+import io
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+from ..compile_project.compile import ReconstructProject, TURBOWARP_META
+from ..convert_project.convert_project import ConvertProject
+
+# one converter/compiler per worker process, reused for every project it gets
+_workers = {}
+
+
+def expand_inputs(patterns=(), manifest=None):
+    """Turn globs and an optional manifest into a list of (src, dst or None).
+
+    Manifest lines are either a plain path or a JSON object with ``src`` and
+    an optional ``dst``. Blank lines and lines starting with ``#`` are skipped.
+    """
+    inputs = []
+    for pattern in patterns:
+        matches = sorted(glob.glob(pattern, recursive=True))
+        if not matches:
+            matches = [pattern]
+        inputs += [(m, None) for m in matches]
+
+    if manifest:
+        with open(manifest, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line or line.startswith("#"):
+                    continue
+                if line.startswith("{"):
+                    entry = json.loads(line)
+                    inputs.append((entry["src"], entry.get("dst")))
+                else:
+                    inputs.append((line, None))
+    return inputs
+
+
+def plan_outputs(inputs, out_dir):
+    """Give every input without an explicit dst its own folder under ``out_dir``."""
+    used = set()
+    planned = []
+    for src, dst in inputs:
+        if dst is None:
+            stem = Path(src).stem if Path(src).suffix in (".sb3", ".pmp") else Path(src).name
+            name, n = stem, 1
+            while name in used:
+                n += 1
+                name = f"{stem}-{n}"
+            used.add(name)
+            dst = str(Path(out_dir) / name)
+        planned.append((src, dst))
+    return planned
+
+
+def run_one(command, src, dst, options):
+    """Convert or compile a single project; never raises, returns a status record."""
+    started = time.perf_counter()
+    record = {"command": command, "src": src, "dst": dst}
+    log = io.StringIO()
+    try:
+        # per-item prints from the converters would drown the JSON lines
+        with contextlib.redirect_stdout(log):
+            if command == "convert":
+                worker = _workers.get("convert")
+                if worker is None:
+                    worker = _workers["convert"] = ConvertProject(shared_assets=options.get("shared_assets", False),
+                                                              split_scripts=options.get("split_scripts", False))
+                if not worker.convert(dst, src, clear=True, stream=options.get("stream", False),
+                                      incremental=options.get("incremental", False)):
+                    raise worker.error
+            else:
+                worker = _workers.get("compile")
+                if worker is None:
+                    worker = _workers["compile"] = ReconstructProject(json_level=options.get("json_level", 6),
+                                                                  compact=options.get("compact", False),
+                                                                  deterministic=options.get("deterministic", False),
+                                                                  optimize=options.get("optimize", False))
+                worker.reconstruct(
+                    structured_project_path=src,
+                    output_dir=dst,
+                    meta_data=TURBOWARP_META if options.get("turbowarp") else None,
+                )
+        record["status"] = "ok"
+    except Exception as e:
+        record["status"] = "error"
+        record["error"] = f"{type(e).__name__}: {e}"
+    record["seconds"] = round(time.perf_counter() - started, 4)
+    return record
+
+
+def run_batch(command, inputs, out_dir, workers=None, options=None, report=None):
+    """Fan ``inputs`` out over a process pool and write one JSON line per project.
+
+    A failing project is reported and the rest keep going. Returns the number
+    of failed projects.
+    """
+    options = options or {}
+    report = report or sys.stdout
+    planned = plan_outputs(inputs, out_dir)
+    Path(out_dir).mkdir(parents=True, exist_ok=True)
+
+    started = time.perf_counter()
+    failed = 0
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as executor:
+        futures = {executor.submit(run_one, command, src, dst, options): (src, dst) for src, dst in planned}
+        for future in as_completed(futures):
+            try:
+                record = future.result()
+            except Exception as e:
+                # the worker process itself died (e.g. out of memory)
+                src, dst = futures[future]
+                record = {"command": command, "src": src, "dst": dst, "status": "error",
+                          "error": f"{type(e).__name__}: {e}"}
+            if record["status"] != "ok":
+                failed += 1
+            report.write(json.dumps(record) + "\n")
+            report.flush()
+
+    summary = {
+        "command": command,
+        "status": "summary",
+        "total": len(planned),
+        "failed": failed,
+        "seconds": round(time.perf_counter() - started, 4),
+    }
+    report.write(json.dumps(summary) + "\n")
+    report.flush()
+    return failed
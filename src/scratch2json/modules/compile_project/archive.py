@@ -0,0 +1,212 @@
+import copy
+import os
+import shutil
+import struct
+import time
+import zipfile
+import zlib
+from pathlib import Path
+
+from ..workers.workers import imap_ordered
+from ..profiling import profiling
+
+# media that is already compressed gains nothing from deflate
+STORED_EXTENSIONS = {
+    ".png", ".jpg", ".jpeg", ".gif", ".webp",
+    ".mp3", ".ogg", ".m4a", ".webm", ".flac",
+    ".woff", ".woff2",
+}
+
+# files above this are streamed by zipfile instead of read into memory
+STREAM_THRESHOLD = 16 * 1024 * 1024
+
+# member metadata for deterministic builds: the zip epoch, rw-r--r--, unix
+FIXED_DATE_TIME = (1980, 1, 1, 0, 0, 0)
+FIXED_MODE = 0o644
+
+
+def compress_type_for(arcname):
+    if Path(arcname).suffix.lower() in STORED_EXTENSIONS:
+        return zipfile.ZIP_STORED
+    return zipfile.ZIP_DEFLATED
+
+
+def compress_level_for(arcname, json_level):
+    if arcname.endswith(".json"):
+        return json_level
+    return None
+
+
+def fix_metadata(info):
+    """Give ``info`` the same timestamp, mode and host on every build."""
+    info.date_time = FIXED_DATE_TIME
+    info.external_attr = (0o100000 | FIXED_MODE) << 16
+    info.create_system = 3
+
+
+def copy_member(src, dst, info, deterministic=False):
+    """Copy a member between archives without inflating and deflating it again.
+
+    zipfile has no public API for this, so the local header is rewritten by
+    hand and the compressed bytes are streamed across as-is.
+    """
+    src.fp.seek(info.header_offset)
+    header = struct.unpack(zipfile.structFileHeader, src.fp.read(zipfile.sizeFileHeader))
+    if header[0] != zipfile.stringFileHeader:
+        raise zipfile.BadZipFile(f"bad local header for {info.filename}")
+    src.fp.seek(info.header_offset + zipfile.sizeFileHeader
+                + header[zipfile._FH_FILENAME_LENGTH] + header[zipfile._FH_EXTRA_FIELD_LENGTH])
+
+    new = copy.copy(info)
+    # sizes and crc are known, so the copy never needs a data descriptor
+    new.flag_bits &= ~0x08
+    new.extra = b""
+    if deterministic:
+        fix_metadata(new)
+    new.header_offset = dst.fp.tell()
+    dst.fp.write(new.FileHeader())
+
+    remaining = info.compress_size
+    while remaining:
+        chunk = src.fp.read(min(remaining, 1024 * 1024))
+        if not chunk:
+            raise zipfile.BadZipFile(f"truncated member {info.filename}")
+        dst.fp.write(chunk)
+        remaining -= len(chunk)
+
+    _register(dst, new)
+
+
+def crc32_file(path):
+    crc = 0
+    with open(path, "rb") as f:
+        # small reads: read(n) allocates all n bytes up front, even near eof
+        while chunk := f.read(64 * 1024):
+            crc = zlib.crc32(chunk, crc)
+    return crc
+
+
+def write_packed(dst, info, payload):
+    """Append a member whose data was already compressed by ``pack``."""
+    info.header_offset = dst.fp.tell()
+    dst.fp.write(info.FileHeader())
+    dst.fp.write(payload)
+    _register(dst, info)
+
+
+def _register(dst, info):
+    dst.filelist.append(info)
+    dst.NameToInfo[info.filename] = info
+    dst.start_dir = dst.fp.tell()
+
+
+def pack(arcname, source, json_level=6, deterministic=False):
+    """Read and compress one member, ready for ``write_packed``.
+
+    ``source`` is either a file path or the member's bytes. This is the
+    expensive part of writing an archive and is safe to run on a thread.
+    """
+    if isinstance(source, (bytes, bytearray)):
+        data = bytes(source)
+        date_time = time.localtime()[:6]
+        mode = 0o644
+    else:
+        with open(source, "rb") as f:
+            data = f.read()
+        profiling.read(len(data))
+        st = os.stat(source)
+        date_time = time.localtime(st.st_mtime)[:6]
+        mode = st.st_mode & 0o777
+
+    info = zipfile.ZipInfo(arcname, date_time=date_time)
+    info.external_attr = (0o100000 | mode) << 16
+    if deterministic:
+        fix_metadata(info)
+    info.compress_type = compress_type_for(arcname)
+    info.file_size = len(data)
+    info.CRC = zlib.crc32(data)
+
+    if info.compress_type == zipfile.ZIP_DEFLATED:
+        level = compress_level_for(arcname, json_level)
+        compressor = zlib.compressobj(
+            level if level is not None else zlib.Z_DEFAULT_COMPRESSION, zlib.DEFLATED, -15)
+        payload = compressor.compress(data) + compressor.flush()
+    else:
+        payload = data
+    info.compress_size = len(payload)
+    return info, payload
+
+
+def write_stream(zf, arcname, path, json_level=6, deterministic=False):
+    """Deflate a big file into ``zf`` chunk by chunk."""
+    if not deterministic:
+        zf.write(path, arcname, compress_type_for(arcname), compress_level_for(arcname, json_level))
+        return
+    info = zipfile.ZipInfo(arcname)
+    fix_metadata(info)
+    # only assets are ever this big, and they use the default level anyway
+    info.compress_type = compress_type_for(arcname)
+    info.file_size = os.path.getsize(path)
+    with open(path, "rb") as src, zf.open(info, "w") as dst:
+        shutil.copyfileobj(src, dst, 1024 * 1024)
+
+
+def write_archive(archive_path, members, previous=None, json_level=6, jobs=1, deterministic=False):
+    """Write ``members`` (arcname -> file path or bytes) to ``archive_path``.
+
+    Assets are named by md5, so a member with the same name, compression,
+    size and crc in the ``previous`` archive is copied over still compressed. The rest is
+    read and compressed on ``jobs`` threads and written in order. The archive
+    is written next to the target and moved into place at the end.
+    With ``deterministic`` members are sorted (project.json first) and get
+    fixed metadata, so the same members always give the same bytes.
+    Returns how many members were reused.
+    """
+    archive_path = Path(archive_path)
+    tmp_path = archive_path.with_name(archive_path.name + ".tmp")
+    reused = 0
+
+    old = None
+    if previous is not None and Path(previous).exists():
+        try:
+            old = zipfile.ZipFile(previous)
+        except zipfile.BadZipFile:
+            old = None
+
+    def plan(arcname):
+        source = members[arcname]
+        if old is not None and not isinstance(source, (bytes, bytearray)):
+            info = old.NameToInfo.get(arcname)
+            if info is not None and info.compress_type == compress_type_for(arcname) and arcname != "project.json":
+                # a file edited in place keeps its name, so check it still matches;
+                # crc is far cheaper than deflate, and the size check skips most edits
+                if os.path.getsize(source) == info.file_size and crc32_file(source) == info.CRC:
+                    profiling.read(info.file_size)
+                    return "reuse", info
+        if not isinstance(source, (bytes, bytearray)) and os.path.getsize(source) > STREAM_THRESHOLD:
+            return "stream", source
+        return "packed", pack(arcname, source, json_level, deterministic)
+
+    names = list(members)
+    if deterministic:
+        names.sort(key=lambda name: (name != "project.json", name))
+
+    try:
+        with zipfile.ZipFile(tmp_path, "w") as zf:
+            for arcname, (kind, value) in zip(names, imap_ordered(plan, names, jobs)):
+                if kind == "reuse":
+                    copy_member(old, zf, value, deterministic)
+                    profiling.read(value.compress_size)
+                    reused += 1
+                elif kind == "stream":
+                    write_stream(zf, arcname, value, json_level, deterministic)
+                    profiling.read(os.path.getsize(value))
+                else:
+                    write_packed(zf, *value)
+    finally:
+        if old is not None:
+            old.close()
+
+    os.replace(tmp_path, archive_path)
+    profiling.wrote(os.path.getsize(archive_path))
+    return reused
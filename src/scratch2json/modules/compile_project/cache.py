@@ -0,0 +1,145 @@
+import hashlib
+import os
+from pathlib import Path
+
+from ..profiling import profiling
+from ..serialize import serialize
+
+# bump whenever the way a target is rebuilt changes, so old entries miss
+CACHE_VERSION = 2
+
+# the parts of a structured project that end up in the .sb3
+PROJECT_PARTS = ("sprites", "stage", "extensions", "fonts", "assets", "monitors.json")
+
+
+def _hash_files(h, path, prj_home):
+    path = Path(path)
+    if path.is_file():
+        walk = [(path.parent, [], [path.name])]
+    else:
+        walk = os.walk(path)
+    for root, dirs, files in walk:
+        dirs.sort()
+        for name in sorted(files):
+            file_path = Path(root) / name
+            st = file_path.stat()
+            rel = file_path.relative_to(prj_home).as_posix()
+            h.update(f"{rel}\0{st.st_size}\0{st.st_mtime_ns}\n".encode("utf-8"))
+
+
+def project_key(prj_home, extra=""):
+    """Like ``BuildCache.target_key`` but over every input of the project."""
+    prj_home = Path(prj_home)
+    h = hashlib.sha1(f"v{CACHE_VERSION}\0{extra}".encode())
+    for part in PROJECT_PARTS:
+        if (prj_home / part).exists():
+            _hash_files(h, prj_home / part, prj_home)
+    return h.hexdigest()
+
+
+class TargetFragment:
+    """A reconstructed target, already serialized to its project.json text."""
+
+    def __init__(self, name, layer_order, text, assets, index):
+        self.name = name
+        self.layer_order = layer_order
+        self.text = text
+        # md5ext -> source file, relative to the structured project
+        self.assets = assets
+        # block references, see query.build_target_index
+        self.index = index
+
+
+class BuildCache:
+    """Remembers rebuilt targets between compiles, keyed on their input files.
+
+    A target's key hashes the path, size and mtime of every file in its
+    folder, so unchanged targets are neither re-read nor re-serialized.
+    Everything lives in ``builddir/.cache``.
+    """
+
+    def __init__(self, builddir):
+        self.dir = Path(builddir) / ".cache"
+        self.index_path = self.dir / "index.json"
+        self.index = serialize.load_index(self.index_path, CACHE_VERSION, "targets")
+        self.used = set()
+        self.hits = 0
+        self.misses = 0
+        # name -> (size, mtime) of everything in the shared assets/ folder
+        self.shared = None
+
+    def target_key(self, target_dir, prj_home, layout=""):
+        h = hashlib.sha1(f"v{CACHE_VERSION}\0{layout}".encode())
+        _hash_files(h, target_dir, prj_home)
+        # assets kept in the shared assets/ folder are inputs of the target too
+        for md5ext in self._shared_refs(target_dir):
+            h.update(f"assets/{md5ext}\0{self._shared_stat(prj_home, md5ext)}\n".encode("utf-8"))
+        return h.hexdigest()
+
+    def _shared_refs(self, target_dir):
+        """md5ext of every asset the target's configs list but its folder lacks."""
+        target_dir = Path(target_dir)
+        refs = []
+        for folder in (target_dir, target_dir / "costumes", target_dir / "sounds"):
+            config = folder / "config.json"
+            if not config.is_file():
+                continue
+            try:
+                items = serialize.load_path(config)
+            except ValueError:
+                # the rebuild reports it
+                continue
+            for item in items if isinstance(items, list) else []:
+                if isinstance(item, dict) and "md5ext" in item and not (folder / item["md5ext"]).exists():
+                    refs.append(item["md5ext"])
+        return sorted(refs)
+
+    def _shared_stat(self, prj_home, md5ext):
+        if self.shared is None:
+            self.shared = {}
+            assets = Path(prj_home) / "assets"
+            if assets.is_dir():
+                for entry in os.scandir(assets):
+                    if entry.is_file():
+                        st = entry.stat()
+                        self.shared[entry.name] = f"{st.st_size}\0{st.st_mtime_ns}"
+        return self.shared.get(md5ext, "missing")
+
+    def get(self, key):
+        entry = self.index.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        try:
+            with open(self.dir / f"{key}.json", "r", encoding="utf-8") as f:
+                text = f.read()
+            profiling.read(len(text))
+        except OSError:
+            self.misses += 1
+            return None
+        self.used.add(key)
+        self.hits += 1
+        return TargetFragment(entry["name"], entry["layerOrder"], text, entry["assets"], entry["index"])
+
+    def put(self, key, fragment):
+        self.dir.mkdir(parents=True, exist_ok=True)
+        with open(self.dir / f"{key}.json", "w", encoding="utf-8") as f:
+            f.write(fragment.text)
+        profiling.wrote(len(fragment.text))
+        self.index[key] = {
+            "name": fragment.name,
+            "layerOrder": fragment.layer_order,
+            "assets": fragment.assets,
+            "index": fragment.index,
+        }
+        self.used.add(key)
+
+    def save(self):
+        """Drop entries this build did not use and write the index."""
+        for key in list(self.index):
+            if key not in self.used:
+                del self.index[key]
+                (self.dir / f"{key}.json").unlink(missing_ok=True)
+
+        serialize.save_index(self.index_path, CACHE_VERSION, "targets", self.index)
+
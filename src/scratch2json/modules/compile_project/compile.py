@@ -1,20 +1,56 @@
-import shutil
-import json
+import hashlib
+import re
+import time
+from collections import Counter
 from pathlib import Path
 import uuid
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from ..tui.tui import tui 
+from .archive import write_archive
+from ..serialize import serialize
+from ..query.query import BLOCK_INDEX_NAME, build_target_index, write_index
+from ..scripts.scripts import has_split_scripts, join_scripts
+from .cache import BuildCache, TargetFragment
+from ..profiling import profiling
+from ..optimize.optimize import AssetOptimizer, rewrite_asset_refs
 
 tl = tui()
 
+TURBOWARP_META = {
+    "semver": "3.0.0",
+    "vm": "0.2.0",
+    "agent": "",
+    "platform": {
+        "name": "TurboWarp",
+        "url": "https://turbowarp.org/"
+    }
+}
+
+# what the player needs from every costume and sound; md5ext it can work out
+REQUIRED_ASSET_KEYS = ("name", "assetId", "dataFormat")
+
 class ReconstructProject:
-    def __init__(self):
-        pass
+    def __init__(self, jobs=1, json_level=6, processes=False, compact=False, deterministic=False, optimize=False):
+        self.jobs = jobs
+        self.json_level = json_level
+        # project.json inside the .sb3 is never read by people, so it can skip the indentation
+        self.compact = compact
+        # parse targets in worker processes instead of threads
+        self.processes = processes
+        # same tree in, same .sb3 bytes out: stable ids, layer order, fixed zip metadata
+        self.deterministic = deterministic
+        # shrink svg/png/wav assets in the .sb3; the structured folder keeps the originals
+        self.optimize = optimize
+        self.cache = None
+        self.members = {}
 
-    def reconstruct(self, structured_project_path, output_dir, meta_data=None):
+    def reconstruct(self, structured_project_path, output_dir, meta_data=None, previous=None):
+        """Rebuild ``output_dir``.zip; members are reused from ``previous``
+        (default: the archive being replaced) when they did not change."""
         print("Starting project reconstruction...")
         prj_home = Path(structured_project_path)
-        output_zip_content = prj_home / "builddir"
-        output_zip_content.mkdir(parents=True, exist_ok=True)
+        builddir = prj_home / "builddir"
+        builddir.mkdir(parents=True, exist_ok=True)
 
         default_meta = {
             "semver": "3.0.0",
@@ -37,22 +73,77 @@ class ReconstructProject:
             "meta": meta_data if meta_data is not None else default_meta
         }
 
-        self._reconstruct_extensions(prj_home, project_data)
-        self._reconstruct_monitors(prj_home, project_data)
-        self._reconstruct_stage(prj_home, output_zip_content, project_data)
-        self._reconstruct_sprites(prj_home, output_zip_content, project_data)
-        self._reconstruct_fonts(prj_home, output_zip_content, project_data)
+        self.cache = BuildCache(builddir)
+        self.members = {}
+
+        with profiling.phase("extensions"):
+            self._reconstruct_extensions(prj_home, project_data)
+        with profiling.phase("monitors"):
+            self._reconstruct_monitors(prj_home, project_data)
+        with profiling.phase("targets"):
+            self._reconstruct_targets(prj_home, project_data)
+        with profiling.phase("fonts"):
+            self._reconstruct_fonts(prj_home, project_data)
+
+        print(f"\nReused {self.cache.hits} cached targets, rebuilt {self.cache.misses}")
+        with profiling.phase("cache"):
+            self.cache.save()
+
+        renamed = {}
+        if self.optimize:
+            with profiling.phase("optimize"):
+                renamed = self._optimize_assets(builddir)
+
+        with profiling.phase("block index"):
+            if write_index(prj_home / BLOCK_INDEX_NAME, {t.name: t.index for t in project_data["targets"]}):
+                print(f"Updated {BLOCK_INDEX_NAME}")
 
         print("\nWriting project.json...")
-        with open(output_zip_content / "project.json", "w", encoding="utf-8") as f:
-            json.dump(project_data, f, indent=4, ensure_ascii=False)
-        
+        with profiling.phase("project.json"):
+            if renamed:
+                self.members["project.json"] = rewrite_asset_refs(self._dump_project(project_data), renamed).encode("utf-8")
+            else:
+                self.members["project.json"] = self._dump_project(project_data).encode("utf-8")
+
         print("Compressing to zip...")
-        shutil.make_archive(output_dir, 'zip', output_zip_content)
+        archive = f"{output_dir}.zip"
+        with profiling.phase("archive"):
+            reused = write_archive(archive, self.members, previous=previous or archive,
+                                   json_level=self.json_level, jobs=self.jobs,
+                                   deterministic=self.deterministic)
+        print(f"Reused {reused} compressed members")
 
         print("Project reconstruction complete!")
+
+    def _dump_project(self, project_data):
+        # targets are already serialized, so splice their text in place of
+        # placeholders instead of building and dumping them again
+        fragments = project_data["targets"]
+        placeholders = [f"\0s2j-target-{i}" for i in range(len(fragments))]
+        text = serialize.dumps({**project_data, "targets": placeholders}, compact=self.compact, ensure_ascii=False)
+        indent = "" if self.compact else " " * 8
+        return re.sub(
+            r'"\\u0000s2j-target-(\d+)"',
+            lambda m: fragments[int(m.group(1))].text.replace("\n", "\n" + indent),
+            text,
+        )
+
+    def _optimize_assets(self, builddir):
+        print("\nOptimizing assets...")
+        optimizer = AssetOptimizer(builddir, jobs=self.jobs)
+        renamed = optimizer.run(self.members)
+        optimizer.save()
+        for old, new in sorted(renamed.items()):
+            profiling.item(f"Optimized {old} -> {new}")
+        print(f"Optimized {len(renamed)} assets ({optimizer.hits} from cache), saved {optimizer.saved / 1024:.1f} KiB")
+        return renamed
+
+    def _add_assets(self, prj_home, fragment):
+        # assets go into the archive straight from the structured folder
+        for md5ext, rel in fragment.assets.items():
+            self.members.setdefault(md5ext, prj_home / rel)
     
-    def _reconstruct_fonts(self, prj_home, output_zip_content, project_data):
+    def _reconstruct_fonts(self, prj_home, project_data):
         print("\nReconstructing font...")
         fonts_dir = prj_home / "fonts"
         fonts_config = fonts_dir / "config.json"
@@ -65,18 +156,17 @@ class ReconstructProject:
             print("\nFont config.json not found, skipping...")
             return
 
-        with open(fonts_config, 'r', encoding="utf-8") as f:
-            font_info = json.load(f)
+        with profiling.reader(open(fonts_config, 'rb')) as f:
+            font_info = serialize.load(f)
             project_data["customFonts"] = font_info
 
             for font in font_info:
                 if "md5ext" in font:
                     font_file = font["md5ext"]
                     src = fonts_dir / font_file
-                    dst = output_zip_content / font_file
                     if src.exists():
-                        shutil.copy(src, dst)
-                        print(f"Copied font file: {font_file}")
+                        self.members.setdefault(font_file, src)
+                        profiling.item(f"Added font file: {font_file}")
                     else:
                         print(f"Missing font file: {font_file}")
         
@@ -89,8 +179,8 @@ class ReconstructProject:
         project_data['extensionURLs'] = {}
 
         if extension_file.exists():
-            with open(extension_file, "r", encoding="utf-8") as f:
-                extensions_info = json.load(f)
+            with profiling.reader(open(extension_file, "rb")) as f:
+                extensions_info = serialize.load(f)
                 clean_urls = {}
 
                 for ext_id, url in extensions_info.items():
@@ -99,31 +189,103 @@ class ReconstructProject:
                         clean_urls[ext_id] = url
 
                 project_data['extensionURLs'] = clean_urls
-                print(f"Loaded extensions: {list(extensions_info.keys())}")
-                print(f"Filtered URLs: {list(clean_urls.keys())}")
+                profiling.item(f"Loaded extensions: {list(extensions_info.keys())}")
+                profiling.item(f"Filtered URLs: {list(clean_urls.keys())}")
 
         if extension_data_file.exists():
-            with open(extension_data_file, "r", encoding="utf-8") as f:
-                extension_data = json.load(f)
+            with profiling.reader(open(extension_data_file, "rb")) as f:
+                extension_data = serialize.load(f)
                 project_data["extensionData"] = extension_data
-                print("Loaded extension data")
+                profiling.item("Loaded extension data")
 
     def _reconstruct_monitors(self, prj_home, project_data):
         print("\nReconstructing monitors...")
         monitors_path = prj_home / "monitors.json"
         if monitors_path.exists():
-            with open(monitors_path, "r", encoding="utf-8") as f:
-                project_data["monitors"] = json.load(f)
-                print("Monitors loaded")
+            with profiling.reader(open(monitors_path, "rb")) as f:
+                project_data["monitors"] = serialize.load(f)
+                profiling.item("Monitors loaded")
 
-    def _reconstruct_stage(self, prj_home, output_zip_content, project_data):
+    def _reconstruct_targets(self, prj_home, project_data):
         stage_dir = prj_home / "stage"
-        if not stage_dir.exists():
+        sprites_dir = prj_home / "sprites"
+        todo = []
+
+        if stage_dir.exists():
+            todo.append(("stage", stage_dir))
+        else:
             print("\nStage directory not found, skipping...")
-            return
 
-        print("\n Reconstructing stage...")
-        stage_target = {
+        if sprites_dir.exists():
+            # sorted so the output does not depend on directory listing order
+            todo += [("sprite", d) for d in sorted(sprites_dir.iterdir()) if d.is_dir()]
+        else:
+            print("No sprites folder found, skipping...")
+
+        print("\nReconstructing targets...")
+        layout = "compact" if self.compact else "pretty"
+        if self.deterministic:
+            layout += "-deterministic"
+        keys = [self.cache.target_key(target_dir, prj_home, layout) for _, target_dir in todo]
+        fragments = [self.cache.get(key) for key in keys]
+        missing = [i for i, fragment in enumerate(fragments) if fragment is None]
+
+        # parsing is the expensive part, so only cache misses go to the pool
+        args = [(todo[i][0], todo[i][1], prj_home, self.compact, self.deterministic) for i in missing]
+        if profiling.enabled():
+            # workers may be processes, so they time themselves and hand the numbers back
+            results = self._map(build_target_profiled, args)
+            rebuilt = [fragment for fragment, _ in results]
+            for (fragment, stats), i in zip(results, missing):
+                profiling.record_target(fragment.name, todo[i][0], cached=False, **stats)
+        else:
+            rebuilt = self._map(build_target, args)
+        for i, fragment in zip(missing, rebuilt):
+            self.cache.put(keys[i], fragment)
+            fragments[i] = fragment
+
+        # the player looks targets up by name, so two with the same one clash
+        clashes = sorted(name for name, n in Counter(f.name for f in fragments).items() if n > 1)
+        if clashes:
+            raise ValueError(f"more than one target is named {', '.join(map(repr, clashes))}")
+
+        order = range(len(todo))
+        if self.deterministic:
+            # stage first, then sprites by layer, ties broken by folder name
+            order = sorted(order, key=lambda i: (todo[i][0] != "stage", fragments[i].layer_order or 0, todo[i][1].name))
+
+        for i in order:
+            fragment = fragments[i]
+            state = "reconstructed" if fragment in rebuilt else "unchanged, using cached build"
+            label = "Stage" if todo[i][0] == "stage" else f"Sprite '{fragment.name}'"
+            profiling.item(f"{label} {state}")
+            if fragment not in rebuilt:
+                profiling.record_target(fragment.name, todo[i][0], 0, cached=True)
+            self._add_assets(prj_home, fragment)
+            project_data["targets"].append(fragment)
+
+    def _map(self, fn, args):
+        if self.jobs <= 1 or len(args) <= 1:
+            return [fn(*a) for a in args]
+        pool = ProcessPoolExecutor if self.processes else ThreadPoolExecutor
+        with pool(self.jobs) as executor:
+            return list(executor.map(fn, *zip(*args)))
+
+
+def stable_target_id(kind, name):
+    # from the target's name rather than its whole content, so the id (which
+    # monitors refer to) survives edits to the target
+    return hashlib.sha1(f"{kind}\0{name}".encode("utf-8")).hexdigest()[:20]
+
+
+def build_target(kind, target_dir, prj_home, compact=False, deterministic=False):
+    """Read one stage/sprite folder back into a serialized target.
+
+    Module level so it can run in a worker process. Targets without an id
+    get a random one, or one derived from their name if ``deterministic``.
+    """
+    if kind == "stage":
+        target = {
             "isStage": True,
             "name": "Stage",
             "variables": {},
@@ -135,7 +297,7 @@ class ReconstructProject:
             "currentCostume": 0,
             "costumes": [],
             "sounds": [],
-            "id": str(uuid.uuid4()),
+            "id": stable_target_id(kind, "Stage") if deterministic else str(uuid.uuid4()),
             "volume": 100,
             "layerOrder": 0,
             "tempo": 60,
@@ -144,84 +306,116 @@ class ReconstructProject:
             "textToSpeechLanguage": None,
             "extensionData": {}
         }
+        meta_file = target_dir / "stage_meta.json"
+        costumes = ""
+    else:
+        name = target_dir.name.replace("_", "/")
+        target = {
+            "isStage": False,
+            "name": name,
+            "variables": {},
+            "lists": {},
+            "broadcasts": {},
+            "customVars": [],
+            "blocks": {},
+            "comments": {},
+            "currentCostume": 0,
+            "costumes": [],
+            "sounds": [],
+            "id": stable_target_id(kind, name) if deterministic else str(uuid.uuid4()),
+            "volume": 100,
+            "layerOrder": 1,
+            "visible": True,
+            "x": 0,
+            "y": 0,
+            "size": 100,
+            "direction": 90,
+            "draggable": False,
+            "rotationStyle": "all around",
+            "extensionData": {}
+        }
+        meta_file = target_dir / "sprite_meta.json"
+        costumes = "costumes"
 
-        meta_file = stage_dir / "stage_meta.json"
-        if meta_file.exists():
-            with open(meta_file, "r", encoding="utf-8") as f:
-                stage_target.update(json.load(f))
-                print("Stage metadata loaded")
+    if meta_file.exists():
+        with open(meta_file, "r", encoding="utf-8") as f:
+            target.update(serialize.load(f))
 
-        self._load_media(stage_dir, "sounds", output_zip_content, stage_target, "sounds")
-        self._load_media(stage_dir, "", output_zip_content, stage_target, "costumes")
-        self._load_script(stage_dir, "script.json", stage_target, "blocks")
+    assets = {}
+    load_media(prj_home, target_dir, "sounds", assets, target, "sounds")
+    load_media(prj_home, target_dir, costumes, assets, target, "costumes")
+    load_script(target_dir, "script.json", target, "blocks")
+    validate_target(target, target_dir)
 
-        project_data["targets"].append(stage_target)
-        print("\nStage reconstructed")
+    return TargetFragment(
+        target["name"],
+        target.get("layerOrder", 0),
+        serialize.dumps(target, compact=compact, ensure_ascii=False),
+        assets,
+        build_target_index(target["blocks"]),
+    )
 
-    def _reconstruct_sprites(self, prj_home, output_zip_content, project_data):
-        sprites_dir = prj_home / "sprites"
-        if not sprites_dir.exists():
-            print("No sprites folder found, skipping...")
-            return
 
-        print("\nReconstructing sprites...")
-        for sprite_dir in sprites_dir.iterdir():
-            if not sprite_dir.is_dir():
-                continue
-
-            sprite_target = {
-                "isStage": False,
-                "name": sprite_dir.name.replace("_", "/"),
-                "variables": {},
-                "lists": {},
-                "broadcasts": {},
-                "customVars": [],
-                "blocks": {},
-                "comments": {},
-                "currentCostume": 0,
-                "costumes": [],
-                "sounds": [],
-                "id": str(uuid.uuid4()),
-                "volume": 100,
-                "layerOrder": 1,
-                "visible": True,
-                "x": 0,
-                "y": 0,
-                "size": 100,
-                "direction": 90,
-                "draggable": False,
-                "rotationStyle": "all around",
-                "extensionData": {}
-            }
-            meta_file = sprite_dir / "sprite_meta.json"
-            if meta_file.exists():
-                with open(meta_file, "r", encoding="utf-8") as f:
-                    sprite_target.update(json.load(f))
-                    print(f"\nSprite meta loaded for {sprite_dir.name.replace("_", "/")}")
-
-            self._load_media(sprite_dir, "sounds", output_zip_content, sprite_target, "sounds")
-            self._load_media(sprite_dir, "costumes", output_zip_content, sprite_target, "costumes")
-            self._load_script(sprite_dir, "script.json", sprite_target, "blocks")
-
-            project_data["targets"].append(sprite_target)
-            print(f"Sprite '{sprite_dir.name.replace("_", "/")}' reconstructed")
-
-    def _load_media(self, base_path, subfolder, output_path, target_obj, key):
-        config_path = base_path / subfolder / "config.json" if subfolder else base_path / "config.json"
-        if config_path.exists():
-            with open(config_path, "r", encoding="utf-8") as f:
-                data = json.load(f)
-                target_obj[key] = data
-                for item in data:
-                    if "md5ext" in item:
-                        file_path = base_path / subfolder / item["md5ext"] if subfolder else base_path / item["md5ext"]
-                        if file_path.exists():
-                            shutil.copy(file_path, output_path / item["md5ext"])
-                            print(f"Copied {item['md5ext']}")
-
-    def _load_script(self, base_path, file_name, target_obj, key):
-        script_path = base_path / file_name
-        if script_path.exists():
-            with open(script_path, "r", encoding="utf-8") as f:
-                target_obj[key] = json.load(f)
-                print(f"Loaded {file_name}")
+def validate_target(target, target_dir):
+    """Raise ValueError, naming every problem, if ``target`` would not load."""
+    problems = []
+    if not isinstance(target.get("name"), str) or not target["name"]:
+        problems.append("name must be a non-empty string")
+    for key in ("variables", "lists", "broadcasts", "blocks", "comments"):
+        if not isinstance(target.get(key), dict):
+            problems.append(f"{key} must be an object")
+    for key in ("costumes", "sounds"):
+        items = target.get(key)
+        if not isinstance(items, list):
+            problems.append(f"{key} must be a list")
+            continue
+        for i, item in enumerate(items):
+            missing = [k for k in REQUIRED_ASSET_KEYS if not isinstance(item, dict) or k not in item]
+            if missing:
+                problems.append(f"{key}[{i}] has no {', '.join(missing)}")
+    costumes = target.get("costumes")
+    if isinstance(costumes, list):
+        current = target.get("currentCostume")
+        if not costumes:
+            problems.append("needs at least one costume")
+        elif not isinstance(current, int) or not 0 <= current < len(costumes):
+            problems.append(f"currentCostume {current!r} is not one of its {len(costumes)} costumes")
+    if problems:
+        raise ValueError(f"{target_dir}: {'; '.join(problems)}")
+
+
+def build_target_profiled(kind, target_dir, prj_home, compact=False, deterministic=False):
+    """``build_target`` plus its wall time and the JSON it had to read."""
+    started = time.perf_counter()
+    fragment = build_target(kind, target_dir, prj_home, compact, deterministic)
+    seconds = time.perf_counter() - started
+    # build_target reads every .json in the folder and none of the media
+    sizes = [path.stat().st_size for path in Path(target_dir).rglob("*.json")]
+    return fragment, {"seconds": seconds, "bytes_read": sum(sizes), "files_read": len(sizes)}
+
+
+def load_media(prj_home, base_path, subfolder, assets, target_obj, key):
+    config_path = base_path / subfolder / "config.json" if subfolder else base_path / "config.json"
+    if config_path.exists():
+        with open(config_path, "r", encoding="utf-8") as f:
+            data = serialize.load(f)
+            target_obj[key] = data
+            for item in data:
+                if "md5ext" in item:
+                    file_path = base_path / subfolder / item["md5ext"] if subfolder else base_path / item["md5ext"]
+                    if not file_path.exists():
+                        # shared layout keeps the file once in assets/
+                        file_path = prj_home / "assets" / item["md5ext"]
+                    if file_path.exists():
+                        assets[item["md5ext"]] = file_path.relative_to(prj_home).as_posix()
+
+
+def load_script(base_path, file_name, target_obj, key):
+    if has_split_scripts(base_path):
+        target_obj[key] = join_scripts(base_path)
+        return
+
+    script_path = base_path / file_name
+    if script_path.exists():
+        with open(script_path, "r", encoding="utf-8") as f:
+            target_obj[key] = serialize.load(f)
@@ -2,24 +2,91 @@ import shutil
 import ijson
 import json
 import os
+from itertools import groupby
 from ..tui.tui import tui 
+from .source import open_source
+from .writer import ProjectWriter
+from .plan import ConvertPlan, IOCounts
+from ..serialize import serialize
+from ..query.query import BLOCK_INDEX_NAME, build_target_index, index_document
+from ..scripts.scripts import INDEX_NAME, SCRIPTS_DIR, build_index, script_file_name, split_blocks
+from ..workers.workers import AssetPool
+from ..profiling import profiling
 from pathlib import Path
 
 tl = tui()
+
+def stream_project(f):
+    """Walk project.json one top level value at a time.
+
+    Yields ``(key, value)`` pairs, except that every entry of ``targets`` is
+    yielded on its own as ``("targets.item", target)`` so the target list is
+    never fully built in memory.
+    """
+    builder = None
+    depth = 0
+    key = None
+    name = None
+    for prefix, event, value in ijson.parse(f, use_float=True):
+        if builder is None:
+            if prefix == "":
+                if event == "map_key":
+                    key = value
+                continue
+            if prefix == "targets" and event in ("start_array", "end_array"):
+                continue
+            builder = ijson.ObjectBuilder()
+            name = "targets.item" if prefix == "targets.item" else key
+
+        builder.event(event, value)
+        if event in ("start_map", "start_array"):
+            depth += 1
+        elif event in ("end_map", "end_array"):
+            depth -= 1
+
+        if depth == 0:
+            yield name, builder.value
+            builder = None
+
+def remove_path(path):
+    if path.is_dir():
+        shutil.rmtree(path)
+    elif path.exists():
+        path.unlink()
+
+def copy_local(src, dst, ready=None):
+    """Copy an asset this convert already wrote, once ``ready`` is done."""
+    if ready is not None:
+        ready.result()
+    shutil.copy(src, dst)
+    profiling.copied(os.path.getsize(dst))
+
 class ConvertProject:
-    def __init__(self):
-        pass
+    def __init__(self, jobs=1, shared_assets=False, split_scripts=False):
+        self.jobs = jobs
+        self.shared_assets = shared_assets
+        self.split_scripts = split_scripts
+        self.assets_fl = None
+        self.pool = AssetPool(1)
+        self.out = ProjectWriter()
+        self.plan = ConvertPlan()
+        # md5ext -> (first file written for it, its pending copy or None)
+        self.copied = {}
+        # per-file read/write counts of the last convert()
+        self.io = IOCounts()
+        # set when the last convert() failed, so callers can report it
+        self.error = None
+        self.block_index = {}
     
-    def convert(self, path, zip_path, clear=False):
+    def convert(self, path, zip_path, clear=False, stream=False, incremental=False):
         # init stuff
         prj_home = Path(path)
-        prj_src = Path(zip_path)
         sprite_fl = prj_home / "sprites"
         extension_fl = prj_home / "extensions"
         fonts_fl = prj_home / "fonts"
         stage_dir = prj_home / "stage"
-        json_file = prj_src / "project.json"
         monitors = prj_home / "monitors.json"
+        assets_fl = prj_home / "assets"
         
         # nuke
         def safe_nuke(path):
@@ -31,68 +98,194 @@ class ConvertProject:
                     elif os.path.isdir(full_path):
                         shutil.rmtree(full_path)
 
-        if clear is True:
-            safe_nuke(sprite_fl)
-            safe_nuke(extension_fl)
-            safe_nuke(stage_dir)
-            safe_nuke(fonts_fl)
-
-        if monitors.exists():
-            monitors.unlink()
-
-        extension_fl.mkdir(parents=True, exist_ok=True)
-
-        
-        with open(json_file, "r") as f:
+        self.error = None
+        self.io = IOCounts()
+        # open the source before touching the destination, so a missing or
+        # corrupt project leaves it as it was
+        try:
+            prj_src = open_source(zip_path)
+            if not prj_src.exists("project.json"):
+                prj_src.close()
+                raise FileNotFoundError(f"no project.json in {zip_path}")
+        except Exception as e:
+            self.error = e
+            print(f"Could not open {zip_path}: {e}")
+            return False
+
+        with prj_src:
+            self.out = ProjectWriter(prj_home, incremental=incremental)
+
+            # an incremental run cleans up after itself using the last manifest
+            if clear is True and not (incremental and self.out.has_manifest()):
+                safe_nuke(sprite_fl)
+                safe_nuke(extension_fl)
+                safe_nuke(stage_dir)
+                safe_nuke(fonts_fl)
+                safe_nuke(assets_fl)
+
+            if monitors.exists() and not incremental:
+                monitors.unlink()
+
+            extension_fl.mkdir(parents=True, exist_ok=True)
+
+            # shared layout: every asset lives once in assets/, named by its md5
+            self.assets_fl = None
+            if self.shared_assets:
+                self.assets_fl = assets_fl
+                self.assets_fl.mkdir(parents=True, exist_ok=True)
+
+            self.block_index = {}
+            self.plan = ConvertPlan()
+            self.copied = {}
+            self.pool = AssetPool(self.jobs)
             try:
-                project_data = json.load(f)
-                monitors = project_data.get('monitors', [])
-                targets = project_data.get('targets', [])
-
-                if 'extensions' in project_data and 'extensionURLs' in project_data:
-                    self.process_extension(prj_src, extension_fl, project_data['extensions'], project_data['extensionURLs'])
+                if stream:
+                    self._convert_streaming(prj_src, prj_home, sprite_fl, extension_fl, fonts_fl)
                 else:
-                    pass
-                
-                print("\n Saving monitors...")
-                monitors_path = prj_home / "monitors.json"
-                with open(monitors_path, 'w') as config_file:
-                    json.dump(monitors, config_file, indent=4)
-
-                stage_processed = False
-                
-                for target_index, target in enumerate(targets):
-                    print(f"\nProcessing target {target_index}:")
-                    if 'extensions' in target and 'extensionURLs' in target:
-                        self.process_extension(prj_src, extension_fl, target['extensions'], target['extensionURLs'])
-                    else:
-                        pass
-
-                    # Process Stage
-                    if 'isStage' in target and target['isStage'] and not stage_processed:
-                        self.process_stage(target, prj_src, prj_home)
-                        stage_processed = True
-                    
-                    # Process Sprites
-                    elif 'name' in target:
-                        self.process_sprite(target, prj_src, sprite_fl)
-                    # Process Fonts
-                    custom_fonts = project_data.get("customFonts", [])
-                    if isinstance(custom_fonts, list) and custom_fonts:
-                        self.process_fonts(custom_fonts, prj_src, fonts_fl)
-                    
-            except json.JSONDecodeError as e: 
+                    self._convert_loaded(prj_src, prj_home, sprite_fl, extension_fl, fonts_fl)
+                with profiling.phase("block index"):
+                    self.out.write_json(prj_home / BLOCK_INDEX_NAME, index_document(self.block_index))
+                with profiling.phase("assets"):
+                    self.pool.wait()
+                with profiling.phase("cleanup"):
+                    self.out.finish(owned=[sprite_fl])
+                print(f"\nWrote {self.out.written} files, {self.out.skipped} unchanged")
+            except (json.JSONDecodeError, ijson.JSONError) as e: 
+                self.error = e
                 print(f"Error decoding project.json: {e}")
             except Exception as e:
+                self.error = e
                 print(f"An unexpected error occurred during conversion: {e}")
-
+            finally:
+                self.io.writes = self.out.writes
+                self.pool.close()
+                self.pool = AssetPool(1)
+                self.plan = ConvertPlan()
+                self.copied = {}
+                self.out = ProjectWriter()
+
+        return self.error is None
+
+    def _convert_loaded(self, prj_src, prj_home, sprite_fl, extension_fl, fonts_fl):
+        with profiling.phase("parse project.json"), self._open(prj_src, "project.json") as f:
+            project_data = serialize.load(f)
+        monitors = project_data.get('monitors', [])
+        targets = project_data.get('targets', [])
+
+        # plan every output first, so nothing is written (or copied) twice
+        with profiling.phase("plan"):
+            if 'extensions' in project_data and 'extensionURLs' in project_data:
+                self.plan.section = ("phase", "extensions")
+                self.process_extension(prj_src, extension_fl, project_data['extensions'], project_data['extensionURLs'],
+                                       project_data.get("extensionData"))
+
+            print("\n Saving monitors...")
+            self.plan.section = ("phase", "monitors")
+            self.plan.write_json(prj_home / "monitors.json", monitors)
+
+            stage_processed = False
+
+            for target_index, target in enumerate(targets):
+                profiling.item(f"\nProcessing target {target_index}:")
+                if 'extensions' in target and 'extensionURLs' in target:
+                    self.plan.section = ("phase", "extensions")
+                    self.process_extension(prj_src, extension_fl, target['extensions'], target['extensionURLs'],
+                                           project_data.get("extensionData"))
+
+                # Process Stage
+                if 'isStage' in target and target['isStage'] and not stage_processed:
+                    self.plan.section = ("target", "Stage", "stage")
+                    self.process_stage(target, prj_src, prj_home)
+                    stage_processed = True
+
+                # Process Sprites
+                elif 'name' in target:
+                    self.plan.section = ("target", target['name'], "sprite")
+                    self.process_sprite(target, prj_src, sprite_fl)
+
+            # Process Fonts
+            custom_fonts = project_data.get("customFonts", [])
+            if isinstance(custom_fonts, list) and custom_fonts:
+                self.plan.section = ("phase", "fonts")
+                self.process_fonts(custom_fonts, prj_src, fonts_fl)
+
+        self._execute(prj_src)
+
+    def _convert_streaming(self, prj_src, prj_home, sprite_fl, extension_fl, fonts_fl):
+        # only one target is ever held in memory, everything else at the top
+        # level of project.json is small and kept until the targets are done
+        top_level = {}
+        target_extensions = []
+        stage_processed = False
+        target_index = 0
+
+        with profiling.phase("stream targets"), self._open(prj_src, "project.json") as f:
+            for key, value in stream_project(f):
+                if key != "targets.item":
+                    top_level[key] = value
+                    continue
+
+                target = value
+                profiling.item(f"\nProcessing target {target_index}:")
+                target_index += 1
+                if 'extensions' in target and 'extensionURLs' in target:
+                    # extensionData usually comes after targets, so wait for it
+                    target_extensions.append((target['extensions'], target['extensionURLs']))
+
+                if 'isStage' in target and target['isStage'] and not stage_processed:
+                    self.plan.section = ("target", "Stage", "stage")
+                    self.process_stage(target, prj_src, prj_home)
+                    stage_processed = True
+                elif 'name' in target:
+                    self.plan.section = ("target", target['name'], "sprite")
+                    self.process_sprite(target, prj_src, sprite_fl)
+                # run this target's part of the plan now, so it can be freed
+                self._execute(prj_src)
+                del target, value
+
+        if 'extensions' in top_level and 'extensionURLs' in top_level:
+            target_extensions.insert(0, (top_level['extensions'], top_level['extensionURLs']))
+        self.plan.section = ("phase", "extensions")
+        for extensions_list, extension_urls_dict in target_extensions:
+            self.process_extension(prj_src, extension_fl, extensions_list, extension_urls_dict,
+                                   top_level.get("extensionData"))
+
+        print("\n Saving monitors...")
+        self.plan.section = ("phase", "monitors")
+        self.plan.write_json(prj_home / "monitors.json", top_level.get('monitors', []))
+
+        custom_fonts = top_level.get("customFonts", [])
+        if isinstance(custom_fonts, list) and custom_fonts:
+            self.plan.section = ("phase", "fonts")
+            self.process_fonts(custom_fonts, prj_src, fonts_fl)
+
+        self._execute(prj_src)
+
+    def _open(self, prj_src, name):
+        self.io.reads[name] += 1
+        return prj_src.open(name)
+
+    def _execute(self, prj_src):
+        """Carry out everything planned so far; asset copies go to the pool."""
+        for section, ops in groupby(self.plan.take(), key=lambda op: op[0]):
+            kind, *label = section
+            with profiling.target(*label) if kind == "target" else profiling.phase(*label):
+                for _, action, *args in ops:
+                    if action == "mkdir":
+                        args[0].mkdir(parents=True, exist_ok=True)
+                    elif action == "json":
+                        self.out.write_json(*args)
+                    elif action == "remove":
+                        remove_path(args[0])
+                    else:
+                        self._copy_asset(prj_src, *args)
 
     def process_stage(self, target, prj_src, prj_home):
-        print(f"Processing Stage...")
+        profiling.item(f"Processing Stage...")
 
         # region create meta data
         stage_dir = prj_home / "stage"
-        stage_dir.mkdir(parents=True, exist_ok=True)
+        self.plan.mkdir(stage_dir)
 
         # Collect stage metadata into a single dictionary
         stage_meta_info = {}
@@ -127,54 +320,46 @@ class ConvertProject:
         
         if stage_meta_info: 
             stage_meta_file = stage_dir / "stage_meta.json"
-            with open(stage_meta_file, 'w') as f:
-                json.dump(stage_meta_info, f, indent=4)
-            print(f"Stage metadata written to {stage_meta_file}")
+            self.plan.write_json(stage_meta_file, stage_meta_info)
+            profiling.item(f"Stage metadata written to {stage_meta_file}")
 
         # region end
             
         if 'sounds' in target:
             sounds = prj_home / "stage" / "sounds"
-            sounds.mkdir(parents=True, exist_ok=True)
+            self.plan.mkdir(sounds)
             sounds_name = sounds / "config.json"
-            with open(sounds_name, "w") as config_file:
-                json.dump(target["sounds"], config_file, indent=4)
+            self.plan.write_json(sounds_name, target["sounds"])
 
             for sound in target["sounds"]:
                 sound_name = sound["assetId"]
                 sound_format = sound["md5ext"]
-                sound_path = prj_src / f"{sound_format}"
-                if sound_path.exists():
-                    shutil.copy(sound_path, sounds)  
+                if prj_src.exists(sound_format):
+                    self._plan_asset(sound_format, sounds)
         
         if 'costumes' in target:
             costumes = prj_home / "stage" 
-            costumes.mkdir(parents=True, exist_ok=True)
+            self.plan.mkdir(costumes)
             costumes_name = costumes / "config.json"
-            with open(costumes_name, "w") as config_file:
-                json.dump(target["costumes"], config_file, indent=4)
+            self.plan.write_json(costumes_name, target["costumes"])
 
             for costume in target["costumes"]:
                 costume_name = costume["assetId"]
                 costume_format = costume["md5ext"]
-                costume_path = prj_src / f"{costume_format}"
-                if costume_path.exists():
-                    shutil.copy(costume_path, costumes) 
+                if prj_src.exists(costume_format):
+                    self._plan_asset(costume_format, costumes)
 
         if 'blocks' in target:
             scripts = prj_home / "stage" 
-            scripts.mkdir(parents=True, exist_ok=True)
-            script_name = scripts / "script.json"
-            with open(script_name, 'w') as script:
-                blocks_str = json.dumps(target["blocks"], indent=4)
-                script.write(blocks_str)
+            self.plan.mkdir(scripts)
+            self.write_blocks(scripts, target["blocks"], target.get("name", "Stage"))
 
     def process_sprite(self, target, prj_src, sprite_fl):
         raw_sprite_name = target['name']
         sprite_name = raw_sprite_name.replace("/", "_")  
         sprite = sprite_fl / sprite_name
-        sprite.mkdir(parents=True, exist_ok=True)
-        print(f"Processing Sprites : {sprite_name}")
+        self.plan.mkdir(sprite)
+        profiling.item(f"Processing Sprites : {sprite_name}")
 
         # region create metadata
         sprite_meta_info = {}
@@ -216,51 +401,80 @@ class ConvertProject:
 
         if sprite_meta_info: 
             sprite_meta_file_path = sprite / "sprite_meta.json" 
-            with open(sprite_meta_file_path, 'w') as f:
-                json.dump(sprite_meta_info, f, indent=4)
-            print(f"Sprite metadata written to {sprite_meta_file_path}")
+            self.plan.write_json(sprite_meta_file_path, sprite_meta_info)
+            profiling.item(f"Sprite metadata written to {sprite_meta_file_path}")
 
         # region end
 
         if 'sounds' in target:
             sounds = sprite / "sounds"
-            sounds.mkdir(parents=True, exist_ok=True)
+            self.plan.mkdir(sounds)
             sounds_name = sounds / "config.json"
-            with open(sounds_name, "w") as config_file:
-                json.dump(target["sounds"], config_file, indent=4)
+            self.plan.write_json(sounds_name, target["sounds"])
 
             for sound in target["sounds"]:
                 sound_name = sound["assetId"]
                 sound_format = sound["md5ext"]
-                sound_path = prj_src / f"{sound_format}"
-                if sound_path.exists():
-                    shutil.copy(sound_path, sounds)  
+                if prj_src.exists(sound_format):
+                    self._plan_asset(sound_format, sounds)
         
         if 'costumes' in target:
             costumes = sprite / "costumes"
-            costumes.mkdir(parents=True, exist_ok=True)
+            self.plan.mkdir(costumes)
             costumes_name = costumes / "config.json"
-            with open(costumes_name, "w") as config_file:
-                json.dump(target["costumes"], config_file, indent=4)
+            self.plan.write_json(costumes_name, target["costumes"])
 
             for costume in target["costumes"]:
                 costume_name = costume["assetId"]
                 costume_format = costume["md5ext"]
-                costume_path = prj_src / f"{costume_format}"
-                if costume_path.exists():
-                    shutil.copy(costume_path, costumes)  
+                if prj_src.exists(costume_format):
+                    self._plan_asset(costume_format, costumes) 
 
         if 'blocks' in target:
             scripts = sprite
-            scripts.mkdir(parents=True, exist_ok=True)
-            script_name = scripts / "script.json"
-            with open(script_name, 'w') as script:
-                blocks_str = json.dumps(target["blocks"], indent=4)
-                script.write(blocks_str)
+            self.plan.mkdir(scripts)
+            self.write_blocks(scripts, target["blocks"], target.get("name", "Stage"))
                 
-    def process_extension(self, prj_src, extension_fl, extensions_list, extension_urls_dict):
+    def write_blocks(self, target_dir, blocks, name):
+        self.block_index[name] = build_target_index(blocks)
+
+        # compile prefers scripts/ when both layouts exist, so drop the
+        # other one or a convert into the same folder leaves stale blocks
+        if not self.split_scripts:
+            self.plan.remove(target_dir / SCRIPTS_DIR)
+            self.plan.write_json(target_dir / "script.json", blocks)
+            return
+        self.plan.remove(target_dir / "script.json")
+
+        # one file per top level script plus an index, so a single script
+        # can be diffed, merged or loaded on its own
+        scripts_dir = target_dir / SCRIPTS_DIR
+        scripts = split_blocks(blocks)
+        for root_id, script in scripts.items():
+            self.plan.write_json(scripts_dir / script_file_name(root_id), script)
+        self.plan.write_json(scripts_dir / INDEX_NAME, build_index(scripts, blocks))
+
+    def _plan_asset(self, md5ext, folder):
+        if self.assets_fl is not None:
+            folder = self.assets_fl
+        self.plan.copy(md5ext, folder)
+
+    def _copy_asset(self, prj_src, md5ext, folder, msg=None):
+        dst = folder / md5ext
+        # assets are named by their md5, so the name doubles as the content hash
+        if self.out.keep(dst, md5ext):
+            self.copied.setdefault(md5ext, (dst, None))
+            return
+        if md5ext in self.copied:
+            # used by several targets: read the source once, copy the rest locally
+            first, ready = self.copied[md5ext]
+            self.pool.submit(copy_local, first, dst, ready, msg=msg, key=dst)
+            return
+        self.io.reads[md5ext] += 1
+        self.copied[md5ext] = (dst, self.pool.submit(prj_src.copy, md5ext, folder, msg=msg, key=dst))
+
+    def process_extension(self, prj_src, extension_fl, extensions_list, extension_urls_dict, extension_extra_data=None):
         extension_data = {}
-        extension_extra_data = {}
 
         if not isinstance(extensions_list, list):
             print(f"Error: 'extensions' data is not a list. Type found: {type(extensions_list)}")
@@ -271,50 +485,35 @@ class ConvertProject:
             return
 
         for ext in extensions_list:
-            print(f"Processing Extension: '{ext}'")
+            profiling.item(f"Processing Extension: '{ext}'")
             if ext in extension_urls_dict:
                 extension_data[ext] = extension_urls_dict[ext]
             else:
                 extension_data[ext] = "URL not available in extensionURLs"
 
         extension_file = extension_fl / "extensions.json"
-        try:
-            with open(extension_file, "w") as f:
-                json.dump(extension_data, f, indent=4)
-        except Exception as e:
-            print(f"Error writing extensions.json to file: {e}")
+        self.plan.write_json(extension_file, extension_data)
 
-        project_json_path = prj_src / "project.json"
-        if project_json_path.exists():
-            try:
-                with open(project_json_path, "r") as f:
-                    raw = json.load(f)
-                    if "extensionData" in raw:
-                        extension_extra_data = raw["extensionData"]
-                        ext_data_file = extension_fl / "extension_data.json"
-                        with open(ext_data_file, "w") as f2:
-                            json.dump(extension_extra_data, f2, indent=4)
-                        print(f"\nextensionData saved to {ext_data_file}")
-            except Exception as e:
-                print(f"Error extracting extensionData: {e}")
+        # extensionData comes from the project.json the caller already parsed
+        if extension_extra_data is not None:
+            ext_data_file = extension_fl / "extension_data.json"
+            self.plan.write_json(ext_data_file, extension_extra_data)
+            profiling.item(f"\nextensionData saved to {ext_data_file}")
     
     def process_fonts(self, custom_fonts, prj_src, fonts_fl):
         print("\nProcessing fonts...")
-        fonts_fl.mkdir(parents=True, exist_ok=True)
+        self.plan.mkdir(fonts_fl)
         config = []
 
         for font in custom_fonts:
             config.append(font)
             if "md5ext" in font:
                 font_file = font["md5ext"]
-                font_src = prj_src / font_file
-                if font_src.exists():
-                    shutil.copy(font_src, fonts_fl)
-                    print(f"Copied font file: {font_file}")
+                if prj_src.exists(font_file):
+                    self.plan.copy(font_file, fonts_fl, msg=f"Copied font file: {font_file}")
                 else:
                     print(f"Font file not found: {font_file}")
 
         config_path = fonts_fl / "config.json"
-        with open(config_path, "w", encoding="utf-8") as f:
-            json.dump(config, f, indent=4)
-        print(f"\nSaved font config to: {config_path}")
\ No newline at end of file
+        self.plan.write_json(config_path, config)
+        profiling.item(f"\nSaved font config to: {config_path}")
\ No newline at end of file
@@ -0,0 +1,78 @@
+from collections import Counter
+from pathlib import Path
+
+
+class ConvertPlan:
+    """Every folder, JSON file and asset copy a convert will produce, and
+    the leftovers it has to delete.
+
+    Planning something twice keeps one entry: a JSON file planned again
+    replaces the earlier data in place, and an asset copy to a destination
+    that is already planned is dropped. Entries remember the section
+    (target or phase) that planned them, so the trace can still time
+    each target when the plan runs.
+    """
+
+    def __init__(self):
+        self.ops = []
+        self.json_at = {}
+        self.copies = set()
+        self.section = ("phase", "plan")
+
+    def __len__(self):
+        return len(self.ops)
+
+    def mkdir(self, path):
+        self.ops.append((self.section, "mkdir", Path(path)))
+
+    def remove(self, path):
+        """Delete a file or folder left over from an earlier convert."""
+        self.ops.append((self.section, "remove", Path(path)))
+
+    def write_json(self, path, data):
+        path = Path(path)
+        op = (self.section, "json", path, data)
+        if path in self.json_at:
+            # the last data planned for a file wins, written only once
+            self.ops[self.json_at[path]] = op
+            return
+        self.json_at[path] = len(self.ops)
+        self.ops.append(op)
+
+    def copy(self, md5ext, folder, msg=None):
+        dst = Path(folder) / md5ext
+        if dst in self.copies:
+            return
+        self.copies.add(dst)
+        self.ops.append((self.section, "copy", md5ext, Path(folder), msg))
+
+    def take(self):
+        """Hand over what is planned so far and start an empty plan.
+
+        Copies already handed over stay known, so a later plan never
+        copies the same destination again.
+        """
+        ops, self.ops, self.json_at = self.ops, [], {}
+        return ops
+
+
+class IOCounts:
+    """How many times a convert read each input and wrote each output.
+
+    ``reads`` is keyed by member name in the source (project.json and
+    asset md5ext), ``writes`` by path relative to the structured project.
+    """
+
+    def __init__(self):
+        self.reads = Counter()
+        self.writes = Counter()
+
+    def repeated(self):
+        """Inputs read and outputs written more than once, which should not happen."""
+        return {
+            "reads": {name: n for name, n in self.reads.items() if n > 1},
+            "writes": {name: n for name, n in self.writes.items() if n > 1},
+        }
+
+    def to_dict(self):
+        return {"reads": dict(self.reads), "writes": dict(self.writes)}
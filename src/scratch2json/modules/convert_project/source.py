@@ -0,0 +1,154 @@
+import io
+import os
+import shutil
+import threading
+import zipfile
+from pathlib import Path
+
+from ..profiling import profiling
+
+
+class FolderSource:
+    """Reads project.json and assets from an already extracted project folder."""
+
+    def __init__(self, path):
+        self.path = Path(path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def open(self, name):
+        return profiling.reader(open(self.path / name, "rb"))
+
+    def exists(self, name):
+        return (self.path / name).is_file()
+
+    def copy(self, name, dst):
+        shutil.copy(self.path / name, dst)
+        profiling.copied(os.path.getsize(self.path / name))
+
+    def close(self):
+        pass
+
+
+class ArchiveSource:
+    """Reads project.json and assets straight out of a .sb3/.pmp archive.
+
+    ``path`` can also be a seekable file object, e.g. a spooled upload. The
+    caller keeps ownership of it; ``close`` only closes the zip reader.
+    """
+
+    def __init__(self, path):
+        self.zip = zipfile.ZipFile(path)
+        self.names = set(self.zip.namelist())
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def open(self, name):
+        return profiling.reader(self.zip.open(name))
+
+    def exists(self, name):
+        return name in self.names
+
+    def copy(self, name, dst):
+        dst = Path(dst)
+        if dst.is_dir():
+            dst = dst / Path(name).name
+        with self.zip.open(name) as src, open(dst, "wb") as out:
+            shutil.copyfileobj(src, out, 1024 * 1024)
+        profiling.copied(self.zip.getinfo(name).file_size)
+
+    def close(self):
+        self.zip.close()
+
+
+class DeltaSource:
+    """Reads project.json and new assets from an upload, and every other
+    asset from the files an earlier convert already wrote.
+
+    ``project`` and the ``uploads`` values are seekable file objects owned by
+    this source; ``stored`` maps ``md5ext`` to an existing file.
+    """
+
+    def __init__(self, project, uploads, stored):
+        self.project = project
+        self.uploads = uploads
+        self.stored = stored
+        # pool threads share the upload file objects
+        self.lock = threading.Lock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _upload(self, name):
+        return self.project if name == "project.json" else self.uploads.get(name)
+
+    def open(self, name):
+        upload = self._upload(name)
+        if upload is None:
+            return profiling.reader(open(self.stored[name], "rb"))
+        with self.lock:
+            upload.seek(0)
+            return profiling.reader(io.BytesIO(upload.read()))
+
+    def exists(self, name):
+        if self._upload(name) is not None:
+            return True
+        return name in self.stored and Path(self.stored[name]).is_file()
+
+    def copy(self, name, dst):
+        dst = Path(dst)
+        if dst.is_dir():
+            dst = dst / Path(name).name
+        upload = self._upload(name)
+        if upload is None:
+            try:
+                shutil.copy(self.stored[name], dst)
+            except shutil.SameFileError:
+                return
+            profiling.copied(os.path.getsize(dst))
+            return
+        with self.lock, open(dst, "wb") as out:
+            upload.seek(0)
+            shutil.copyfileobj(upload, out, 1024 * 1024)
+            profiling.copied(out.tell())
+
+    def close(self):
+        self.project.close()
+        for upload in self.uploads.values():
+            upload.close()
+
+
+def referenced_assets(project_data):
+    """Every ``md5ext`` a parsed project.json points at."""
+    names = set()
+    for target in project_data.get("targets", []):
+        for asset in target.get("costumes", []) + target.get("sounds", []):
+            if "md5ext" in asset:
+                names.add(asset["md5ext"])
+    fonts = project_data.get("customFonts", [])
+    if isinstance(fonts, list):
+        names.update(font["md5ext"] for font in fonts if isinstance(font, dict) and "md5ext" in font)
+    return names
+
+
+def open_source(path):
+    """Pick the right reader for an extracted folder, a .sb3/.pmp file or an
+    open archive file object. A source passed in is used as is."""
+    if isinstance(path, (FolderSource, ArchiveSource, DeltaSource)):
+        return path
+    if hasattr(path, "read"):
+        return ArchiveSource(path)
+    if Path(path).is_dir():
+        return FolderSource(path)
+    return ArchiveSource(path)
@@ -0,0 +1,150 @@
+import hashlib
+import json
+import os
+import shutil
+from collections import Counter
+from pathlib import Path
+
+from ..profiling import profiling
+from ..serialize import serialize
+
+MANIFEST_NAME = ".scratch2json-manifest.json"
+
+
+class ProjectWriter:
+    """Writes the structured project and remembers what it wrote.
+
+    Every file is recorded in a manifest (content hash plus size and mtime)
+    saved at the project root. In incremental mode a file is only rewritten
+    when its content differs from the last run or it was touched on disk,
+    and files the previous run wrote but this one did not are deleted.
+    """
+
+    def __init__(self, root=None, incremental=False):
+        self.root = Path(root) if root is not None else None
+        self.incremental = incremental
+        self.old = self._load_manifest() if incremental else {}
+        self.new = {}
+        self.written = 0
+        self.skipped = 0
+        # times each file (relative path) was written this run
+        self.writes = Counter()
+
+    def has_manifest(self):
+        return self.root is not None and (self.root / MANIFEST_NAME).exists()
+
+    def _load_manifest(self):
+        if self.root is None:
+            return {}
+        manifest = self.root / MANIFEST_NAME
+        if not manifest.exists():
+            return {}
+        try:
+            with open(manifest, "r", encoding="utf-8") as f:
+                return json.load(f).get("files", {})
+        except (OSError, ValueError):
+            return {}
+
+    def _rel(self, path):
+        path = Path(path)
+        if self.root is None:
+            return path.as_posix()
+        return path.relative_to(self.root).as_posix()
+
+    def keep(self, path, digest):
+        """Record ``path`` with ``digest``; True if the file on disk is already that."""
+        rel = self._rel(path)
+        if rel in self.new:
+            # written earlier in this run, so disk matches what we recorded
+            unchanged = self.new[rel] == digest
+        else:
+            entry = self.old.get(rel)
+            unchanged = entry is not None and entry["hash"] == digest and self._same_stat(path, entry)
+        self.new[rel] = digest
+
+        if unchanged:
+            self.skipped += 1
+        else:
+            self.written += 1
+            self.writes[rel] += 1
+        return unchanged
+
+    def _same_stat(self, path, entry):
+        try:
+            st = os.stat(path)
+        except OSError:
+            return False
+        return st.st_size == entry["size"] and st.st_mtime_ns == entry["mtime"]
+
+    def write_json(self, path, data):
+        self.write_bytes(path, serialize.dumps(data).encode("utf-8"))
+
+    def write_bytes(self, path, data):
+        if self.keep(path, hashlib.sha1(data).hexdigest()):
+            return
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        with open(path, "wb") as f:
+            f.write(data)
+        profiling.wrote(len(data))
+
+    def finish(self, owned=()):
+        """Delete files that are gone from the project and save the manifest.
+
+        ``owned`` folders (e.g. sprites/) lose any child this run did not
+        write to, even if the old manifest never knew about it.
+        """
+        if self.root is None:
+            return
+
+        if self.incremental:
+            for rel in self.old.keys() - self.new.keys():
+                path = self.root / rel
+                if path.is_file():
+                    path.unlink()
+                    profiling.item(f"Removed {rel}")
+                self._prune(path.parent)
+
+            live = set()
+            for rel in self.new:
+                parts = rel.split("/")
+                live.update("/".join(parts[:i]) for i in range(1, len(parts) + 1))
+            for folder in owned:
+                if not Path(folder).is_dir():
+                    continue
+                for child in Path(folder).iterdir():
+                    if self._rel(child) in live:
+                        continue
+                    if child.is_dir():
+                        shutil.rmtree(child)
+                    else:
+                        child.unlink()
+                    profiling.item(f"Removed {self._rel(child)}")
+
+        files = {}
+        for rel, digest in sorted(self.new.items()):
+            try:
+                st = os.stat(self.root / rel)
+            except OSError:
+                continue
+            files[rel] = {"hash": digest, "size": st.st_size, "mtime": st.st_mtime_ns}
+
+        with open(self.root / MANIFEST_NAME, "w", encoding="utf-8") as f:
+            json.dump({"files": files}, f, indent=4)
+
+    def _prune(self, folder):
+        while folder != self.root and folder.is_dir() and not any(folder.iterdir()):
+            folder.rmdir()
+            folder = folder.parent
+
+
+def stored_assets(root):
+    """Map ``md5ext`` to a path under ``root`` for every asset the last run
+    wrote that is still untouched on disk."""
+    writer = ProjectWriter(root, incremental=True)
+    assets = {}
+    for rel, entry in writer.old.items():
+        path = writer.root / rel
+        # assets are recorded with their own file name as the hash
+        if entry["hash"] == path.name and writer._same_stat(path, entry):
+            assets.setdefault(path.name, path)
+    return assets
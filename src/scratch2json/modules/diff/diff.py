@@ -0,0 +1,251 @@
+import hashlib
+import zipfile
+from pathlib import Path
+
+from ..convert_project.source import open_source, referenced_assets
+from ..scripts.scripts import SCRIPTS_DIR, has_split_scripts, join_scripts
+from ..serialize import serialize
+
+# fields diffed on their own rather than as plain properties
+COLLECTIONS = ("variables", "lists", "broadcasts", "comments", "costumes", "sounds")
+
+# compile gives targets a fresh random id, so ids never match across round trips
+IGNORED = {"id", "blocks"}
+
+
+def _diff_dict(a, b):
+    """added/removed/changed keys between two dicts, empty parts left out."""
+    diff = {
+        "added": {k: b[k] for k in b if k not in a},
+        "removed": {k: a[k] for k in a if k not in b},
+        "changed": {k: [a[k], b[k]] for k in a if k in b and a[k] != b[k]},
+    }
+    return {part: value for part, value in diff.items() if value}
+
+
+def _by_key(items, key):
+    if not isinstance(items, list):
+        return {}
+    return {item.get(key): item for item in items if isinstance(item, dict)}
+
+
+def _significant(props):
+    # compile fills in defaults like customVars: [] and extensionData: {},
+    # so an empty value is treated the same as a missing one
+    return {k: v for k, v in props.items() if k not in IGNORED and v not in ({}, [], None)}
+
+
+class TargetView:
+    """One stage/sprite, with its blocks loaded only when they are needed.
+
+    ``raw`` is a digest of the files the blocks are stored in, when they
+    come from a structured folder; equal digests mean equal blocks.
+    """
+
+    def __init__(self, data, blocks=None, loader=None, raw=None):
+        self.name = data.get("name")
+        self.is_stage = bool(data.get("isStage"))
+        self.data = data
+        self._blocks = blocks
+        self.loader = loader
+        self.raw = raw
+
+    def blocks(self):
+        if self._blocks is None:
+            self._blocks = self.loader() if self.loader else {}
+        return self._blocks
+
+    def properties(self):
+        return _significant({k: v for k, v in self.data.items() if k not in COLLECTIONS})
+
+
+class ProjectView:
+    def __init__(self, path, targets, monitors, extensions, fonts):
+        self.path = str(path)
+        self.targets = {t.name: t for t in targets}
+        self.monitors = monitors if isinstance(monitors, list) else []
+        self.extensions = set(extensions)
+        self.fonts = fonts if isinstance(fonts, list) else []
+
+    def assets(self):
+        return referenced_assets({
+            "targets": [t.data for t in self.targets.values()],
+            "customFonts": self.fonts,
+        })
+
+
+def is_structured(path):
+    path = Path(path)
+    return path.is_dir() and ((path / "stage").is_dir() or (path / "sprites").is_dir())
+
+
+def _load_json(path, default):
+    if not path.exists():
+        return default
+    return serialize.load_path(path)
+
+
+def _script_digest(target_dir):
+    """md5 over the bytes blocks are stored in, without parsing them."""
+    h = hashlib.md5()
+    if has_split_scripts(target_dir):
+        files = sorted((target_dir / SCRIPTS_DIR).iterdir())
+    else:
+        files = [target_dir / "script.json"]
+    for path in files:
+        if path.is_file():
+            h.update(path.name.encode("utf-8") + b"\0")
+            h.update(path.read_bytes())
+    return h.digest()
+
+
+def _load_blocks(target_dir):
+    if has_split_scripts(target_dir):
+        return join_scripts(target_dir)
+    return _load_json(target_dir / "script.json", {})
+
+
+def _folder_target(target_dir, is_stage):
+    if is_stage:
+        data = {"isStage": True, "name": "Stage"}
+        data.update(_load_json(target_dir / "stage_meta.json", {}))
+        costumes_dir = target_dir
+    else:
+        data = {"isStage": False, "name": target_dir.name.replace("_", "/")}
+        data.update(_load_json(target_dir / "sprite_meta.json", {}))
+        costumes_dir = target_dir / "costumes"
+    data["costumes"] = _load_json(costumes_dir / "config.json", [])
+    data["sounds"] = _load_json(target_dir / "sounds" / "config.json", [])
+    return TargetView(data, loader=lambda: _load_blocks(target_dir), raw=_script_digest(target_dir))
+
+
+def load_structured(path):
+    path = Path(path)
+    targets = []
+    if (path / "stage").is_dir():
+        targets.append(_folder_target(path / "stage", True))
+    if (path / "sprites").is_dir():
+        targets += [_folder_target(d, False) for d in sorted((path / "sprites").iterdir()) if d.is_dir()]
+    extensions = _load_json(path / "extensions" / "extensions.json", {})
+    return ProjectView(
+        path,
+        targets,
+        _load_json(path / "monitors.json", []),
+        extensions.keys() if isinstance(extensions, dict) else extensions,
+        _load_json(path / "fonts" / "config.json", []),
+    )
+
+
+def load_packed(path):
+    """A .sb3/.pmp archive or an extracted one; only project.json is read."""
+    with open_source(path) as src, src.open("project.json") as f:
+        project_data = serialize.load(f)
+    targets = []
+    for target in project_data.get("targets", []):
+        blocks = target.get("blocks", {})
+        targets.append(TargetView({k: v for k, v in target.items() if k != "blocks"}, blocks=blocks))
+    return ProjectView(path, targets, project_data.get("monitors", []), project_data.get("extensions", []),
+                       project_data.get("customFonts", []))
+
+
+def load_project(path):
+    return load_structured(path) if is_structured(path) else load_packed(path)
+
+
+def archive_fingerprint(path):
+    """Member names plus project.json's CRC and size, straight from the zip
+    directory, or None for anything that is not an archive."""
+    if Path(path).is_dir() or not zipfile.is_zipfile(path):
+        return None
+    with zipfile.ZipFile(path) as zf:
+        try:
+            info = zf.getinfo("project.json")
+        except KeyError:
+            return None
+        return frozenset(zf.namelist()), info.CRC, info.file_size
+
+
+def diff_blocks(a, b):
+    """Compare two targets' blocks, parsing them only if their bytes differ."""
+    if a.raw is not None and a.raw == b.raw:
+        return {}
+    blocks_a, blocks_b = a.blocks(), b.blocks()
+    if blocks_a == blocks_b:
+        return {}
+
+    def opcode(block):
+        return block.get("opcode") if isinstance(block, dict) else "primitive"
+
+    diff = _diff_dict(blocks_a, blocks_b)
+    # block ids and opcodes are enough to find a change, and much shorter
+    return {part: {block_id: opcode(value[-1] if part == "changed" else value)
+                   for block_id, value in blocks.items()}
+            for part, blocks in diff.items()}
+
+
+def diff_targets(a, b):
+    changes = {}
+    props = _diff_dict(a.properties(), b.properties())
+    if props:
+        changes["properties"] = props
+    for key in ("variables", "lists", "broadcasts", "comments"):
+        diff = _diff_dict(a.data.get(key) or {}, b.data.get(key) or {})
+        if diff:
+            changes[key] = diff
+    for key in ("costumes", "sounds"):
+        # assets are compared by md5 alone, through md5ext
+        diff = _diff_dict(_by_key(a.data.get(key), "name"), _by_key(b.data.get(key), "name"))
+        if diff:
+            changes[key] = diff
+    blocks = diff_blocks(a, b)
+    if blocks:
+        changes["blocks"] = blocks
+    return changes
+
+
+def diff_projects(a, b):
+    report = {"a": a.path, "b": b.path}
+
+    changed = {}
+    for name in a.targets.keys() & b.targets.keys():
+        changes = diff_targets(a.targets[name], b.targets[name])
+        if changes:
+            changed[name] = changes
+    targets = {
+        "added": sorted(b.targets.keys() - a.targets.keys()),
+        "removed": sorted(a.targets.keys() - b.targets.keys()),
+        "changed": dict(sorted(changed.items())),
+    }
+    targets = {part: value for part, value in targets.items() if value}
+    if targets:
+        report["targets"] = targets
+
+    assets_a, assets_b = a.assets(), b.assets()
+    assets = {"added": sorted(assets_b - assets_a), "removed": sorted(assets_a - assets_b)}
+    assets = {part: value for part, value in assets.items() if value}
+    if assets:
+        report["assets"] = assets
+
+    extensions = {"added": sorted(b.extensions - a.extensions), "removed": sorted(a.extensions - b.extensions)}
+    extensions = {part: value for part, value in extensions.items() if value}
+    if extensions:
+        report["extensions"] = extensions
+
+    monitors = _diff_dict(_by_key(a.monitors, "id"), _by_key(b.monitors, "id"))
+    if monitors:
+        report["monitors"] = monitors
+    fonts = _diff_dict(_by_key(a.fonts, "md5ext"), _by_key(b.fonts, "md5ext"))
+    if fonts:
+        report["fonts"] = fonts
+
+    report["identical"] = len(report) == 2
+    return report
+
+
+def diff_paths(a, b):
+    """Diff two projects given as archives, extracted folders or structured folders."""
+    fingerprint = archive_fingerprint(a)
+    if fingerprint is not None and fingerprint == archive_fingerprint(b):
+        # same members and the same project.json, nothing left to parse
+        return {"a": str(a), "b": str(b), "identical": True}
+    return diff_projects(load_project(a), load_project(b))
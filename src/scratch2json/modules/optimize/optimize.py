@@ -0,0 +1,209 @@
+import hashlib
+import os
+import re
+import struct
+import zlib
+from pathlib import Path
+
+from ..profiling import profiling
+from ..serialize import serialize
+from ..workers.workers import imap_ordered
+
+# bump whenever an optimizer changes its output, so cached results miss
+OPTIMIZER_VERSION = 1
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+# ancillary chunks the player never looks at
+PNG_DROP = {b"tEXt", b"zTXt", b"iTXt", b"tIME"}
+
+# fmt/data carry the sound, fact holds the sample count of ADPCM sounds
+WAV_KEEP = {b"fmt ", b"data", b"fact"}
+
+SVG_COMMENT = re.compile(rb"<!--.*?-->", re.S)
+SVG_METADATA = re.compile(rb"<metadata\b.*?</metadata>|<metadata\b[^>]*/>", re.S)
+SVG_BETWEEN_TAGS = re.compile(rb">\s+<")
+
+
+def minify_svg(data):
+    """Drop comments, <metadata> and whitespace between tags.
+
+    Whitespace is left alone in drawings with text, where it can be part
+    of what gets rendered.
+    """
+    if b"<![CDATA[" in data:
+        return data
+    out = SVG_COMMENT.sub(b"", data)
+    out = SVG_METADATA.sub(b"", out)
+    if b"<text" not in out and b"xml:space" not in out:
+        out = SVG_BETWEEN_TAGS.sub(b"><", out)
+    return out.strip()
+
+
+def _png_chunk(kind, body):
+    return struct.pack(">I", len(body)) + kind + body + struct.pack(">I", zlib.crc32(kind + body))
+
+
+def recompress_png(data):
+    """Re-deflate the image data at level 9 into one IDAT and drop text chunks.
+
+    The decoded pixels are untouched, so this is lossless.
+    """
+    if not data.startswith(PNG_SIGNATURE):
+        return data
+    chunks = []
+    idat = []
+    pos = len(PNG_SIGNATURE)
+    while pos + 8 <= len(data):
+        length, kind = struct.unpack(">I4s", data[pos:pos + 8])
+        body = data[pos + 8:pos + 8 + length]
+        pos += 12 + length
+        if kind == b"IDAT":
+            if not idat:
+                chunks.append((b"IDAT", None))
+            idat.append(body)
+        elif kind not in PNG_DROP:
+            chunks.append((kind, body))
+        if kind == b"IEND":
+            break
+    if not idat:
+        return data
+
+    try:
+        pixels = zlib.decompress(b"".join(idat))
+    except zlib.error:
+        return data
+    packed = zlib.compress(pixels, 9)
+
+    out = [PNG_SIGNATURE]
+    for kind, body in chunks:
+        out.append(_png_chunk(kind, packed if body is None else body))
+    return b"".join(out)
+
+
+def strip_wav(data):
+    """Keep only the RIFF chunks needed to play the sound (no LIST, id3, ...)."""
+    if len(data) < 12 or data[:4] != b"RIFF" or data[8:12] != b"WAVE":
+        return data
+    kept = []
+    pos = 12
+    while pos + 8 <= len(data):
+        kind, length = struct.unpack("<4sI", data[pos:pos + 8])
+        end = pos + 8 + length + (length & 1)
+        if end > len(data) and kind != b"data":
+            return data
+        if kind in WAV_KEEP:
+            kept.append(data[pos:end])
+        pos = end
+    body = b"WAVE" + b"".join(kept)
+    return b"RIFF" + struct.pack("<I", len(body)) + body
+
+
+OPTIMIZERS = {
+    ".svg": minify_svg,
+    ".png": recompress_png,
+    ".wav": strip_wav,
+}
+
+
+def optimize_bytes(md5ext, data):
+    """Return the smaller version of an asset, or None if there is no gain."""
+    optimizer = OPTIMIZERS.get(Path(md5ext).suffix.lower())
+    if optimizer is None:
+        return None
+    try:
+        out = optimizer(data)
+    except (struct.error, ValueError):
+        return None
+    return out if len(out) < len(data) else None
+
+
+class AssetOptimizer:
+    """Shrinks compile assets once and remembers the result across builds.
+
+    Results live in ``builddir/.optimized``, keyed by the source ``md5ext``:
+    the optimized file is stored under its own new md5 name, and assets
+    that could not be shrunk are remembered too so they are not tried again.
+    """
+
+    def __init__(self, builddir, jobs=1):
+        self.dir = Path(builddir) / ".optimized"
+        self.index_path = self.dir / "index.json"
+        self.jobs = jobs
+        self.index = serialize.load_index(self.index_path, OPTIMIZER_VERSION, "assets")
+        self.hits = 0
+        self.saved = 0
+
+    def _optimize(self, item):
+        md5ext, path = item
+        with open(path, "rb") as f:
+            data = f.read()
+        profiling.read(len(data))
+        out = optimize_bytes(md5ext, data)
+        if out is None:
+            return md5ext, None, 0
+        new_md5ext = hashlib.md5(out).hexdigest() + Path(md5ext).suffix
+        self.dir.mkdir(parents=True, exist_ok=True)
+        tmp = self.dir / (new_md5ext + ".tmp")
+        with open(tmp, "wb") as f:
+            f.write(out)
+        os.replace(tmp, self.dir / new_md5ext)
+        profiling.wrote(len(out))
+        return md5ext, new_md5ext, len(data) - len(out)
+
+    def run(self, members):
+        """Swap optimizable members for their smaller versions, in place.
+
+        Returns ``{old md5ext: new md5ext}`` for every asset that changed.
+        """
+        todo = []
+        for md5ext, source in members.items():
+            if isinstance(source, (bytes, bytearray)) or Path(md5ext).suffix.lower() not in OPTIMIZERS:
+                continue
+            entry = self.index.get(md5ext, False)
+            if entry is False or (entry is not None and not (self.dir / entry["md5ext"]).exists()):
+                todo.append((md5ext, source))
+            else:
+                self.hits += 1
+
+        for md5ext, new_md5ext, saved in imap_ordered(self._optimize, todo, self.jobs):
+            self.index[md5ext] = {"md5ext": new_md5ext, "saved": saved} if new_md5ext else None
+
+        renamed = {}
+        for md5ext in [name for name in members if self.index.get(name)]:
+            entry = self.index[md5ext]
+            renamed[md5ext] = entry["md5ext"]
+            self.saved += entry["saved"]
+            del members[md5ext]
+            members.setdefault(entry["md5ext"], self.dir / entry["md5ext"])
+        return renamed
+
+    def save(self):
+        serialize.save_index(self.index_path, OPTIMIZER_VERSION, "assets", self.index)
+
+
+ASSET_REF = re.compile(r'("(?:assetId|md5ext)":\s*")([0-9a-f]{32})((?:\.\w+)?")')
+
+
+def rewrite_asset_refs(text, renamed):
+    """Point ``assetId``/``md5ext`` in project.json text at renamed assets.
+
+    ``assetId`` only carries the md5 and not the extension, so it is
+    renamed when any asset with that md5 was.
+    """
+    if not renamed:
+        return text
+    by_md5 = {Path(old).stem: Path(new).stem for old, new in renamed.items()}
+    by_name = dict(renamed)
+
+    def swap(m):
+        head, md5, tail = m.group(1), m.group(2), m.group(3)
+        if tail != '"':
+            name = md5 + tail[:-1]
+            if name in by_name:
+                return head + by_name[name] + '"'
+            return m.group(0)
+        if md5 in by_md5:
+            return head + by_md5[md5] + tail
+        return m.group(0)
+
+    return ASSET_REF.sub(swap, text)
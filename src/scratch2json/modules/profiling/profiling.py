@@ -0,0 +1,198 @@
+import contextlib
+import json
+import sys
+import threading
+import time
+
+COUNTERS = ("bytes_read", "bytes_written", "files_read", "files_written")
+
+# set by session(); both are read from worker threads, so only ever swapped whole
+_tracer = None
+_quiet = False
+
+
+def item(msg):
+    """Print a per-item progress line (one asset, target, extension...).
+
+    ``--quiet`` drops these; phase headers and summaries still use print.
+    """
+    if not _quiet:
+        print(msg)
+
+
+def is_quiet():
+    return _quiet
+
+
+def enabled():
+    return _tracer is not None
+
+
+class Tracer:
+    """Collects wall time and I/O counters per phase and per target.
+
+    Counters are global to the run. A phase records how much they moved
+    while it was open, so with ``--jobs`` above 1 a background copy counts
+    towards whichever phase is open when it finishes.
+    """
+
+    def __init__(self, command):
+        self.command = command
+        self.lock = threading.Lock()
+        self.counters = dict.fromkeys(COUNTERS, 0)
+        self.phases = []
+        self.targets = []
+        self.started = time.perf_counter()
+
+    def add(self, read=None, written=None):
+        with self.lock:
+            if read is not None:
+                self.counters["bytes_read"] += read
+                self.counters["files_read"] += 1
+            if written is not None:
+                self.counters["bytes_written"] += written
+                self.counters["files_written"] += 1
+
+    def snapshot(self):
+        with self.lock:
+            return dict(self.counters)
+
+    @contextlib.contextmanager
+    def measure(self, records, entry):
+        before = self.snapshot()
+        started = time.perf_counter()
+        try:
+            yield entry
+        finally:
+            entry["seconds"] = round(time.perf_counter() - started, 6)
+            after = self.snapshot()
+            entry.update({key: after[key] - before[key] for key in COUNTERS})
+            with self.lock:
+                records.append(entry)
+
+    def to_dict(self):
+        total = {"seconds": round(time.perf_counter() - self.started, 6)}
+        total.update(self.snapshot())
+        return {
+            "command": self.command,
+            "total": total,
+            "phases": self.phases,
+            "targets": self.targets,
+        }
+
+
+def phase(name):
+    """Time a phase of the run; a no-op unless ``--profile`` is on."""
+    tracer = _tracer
+    if tracer is None:
+        return contextlib.nullcontext()
+    return tracer.measure(tracer.phases, {"phase": name})
+
+
+def target(name, kind):
+    """Like ``phase`` but recorded per stage/sprite."""
+    tracer = _tracer
+    if tracer is None:
+        return contextlib.nullcontext()
+    return tracer.measure(tracer.targets, {"target": name, "kind": kind})
+
+
+def record_target(name, kind, seconds, **counters):
+    """Add a per-target record measured elsewhere, e.g. in a worker process."""
+    tracer = _tracer
+    if tracer is None:
+        return
+    entry = {"target": name, "kind": kind, "seconds": round(seconds, 6)}
+    entry.update(dict.fromkeys(COUNTERS, 0))
+    entry.update(counters)
+    with tracer.lock:
+        tracer.targets.append(entry)
+        # it happened during this run, so it belongs in the totals too
+        for key in COUNTERS:
+            tracer.counters[key] += entry[key]
+
+
+def read(nbytes):
+    tracer = _tracer
+    if tracer is not None:
+        tracer.add(read=nbytes)
+
+
+def wrote(nbytes):
+    tracer = _tracer
+    if tracer is not None:
+        tracer.add(written=nbytes)
+
+
+def copied(nbytes):
+    tracer = _tracer
+    if tracer is not None:
+        tracer.add(read=nbytes, written=nbytes)
+
+
+class CountingReader:
+    """File wrapper that reports how much was read once it is closed."""
+
+    def __init__(self, f):
+        self.f = f
+        self.count = 0
+
+    def read(self, size=-1):
+        data = self.f.read(size)
+        self.count += len(data)
+        return data
+
+    def __getattr__(self, name):
+        return getattr(self.f, name)
+
+    def __iter__(self):
+        for line in self.f:
+            self.count += len(line)
+            yield line
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        if self.f is not None:
+            self.f.close()
+            read(self.count)
+            self.f = None
+
+
+def reader(f):
+    """Count what is read from ``f`` when profiling, otherwise return it as is."""
+    if _tracer is None:
+        return f
+    return CountingReader(f)
+
+
+@contextlib.contextmanager
+def session(command, profile=None, quiet=False):
+    """Run a command with ``--quiet`` and/or ``--profile`` applied.
+
+    The trace is written as JSON to ``profile`` ("-" for stdout) when the
+    command finishes, even if it failed. With "-" everything the command
+    prints goes to stderr instead, so stdout is nothing but the trace.
+    """
+    global _tracer, _quiet
+    old_tracer, old_quiet = _tracer, _quiet
+    _quiet = quiet
+    _tracer = Tracer(command) if profile else None
+    tracer = _tracer
+    stdout = sys.stdout
+    try:
+        with contextlib.redirect_stdout(sys.stderr) if profile == "-" else contextlib.nullcontext():
+            yield tracer
+    finally:
+        _tracer, _quiet = old_tracer, old_quiet
+        if tracer is not None:
+            text = json.dumps(tracer.to_dict(), indent=4)
+            if profile == "-":
+                stdout.write(text + "\n")
+            else:
+                with open(profile, "w", encoding="utf-8") as f:
+                    f.write(text + "\n")
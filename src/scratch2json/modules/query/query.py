@@ -0,0 +1,133 @@
+from pathlib import Path
+
+from ..scripts.scripts import find_roots
+from ..profiling import profiling
+from ..serialize import serialize
+
+BLOCK_INDEX_NAME = "block_index.json"
+INDEX_VERSION = 1
+
+# field name -> reference kind
+FIELD_REFS = {
+    "VARIABLE": "variables",
+    "LIST": "lists",
+    "BROADCAST_OPTION": "broadcasts",
+}
+
+# primitive array type -> reference kind (see the sb3 format docs)
+PRIMITIVE_REFS = {
+    11: "broadcasts",
+    12: "variables",
+    13: "lists",
+}
+
+KINDS = ("opcodes", "variables", "lists", "broadcasts", "procedures", "calls")
+
+
+def _add(index, kind, key, block_id, name=None):
+    entry = index[kind].setdefault(key, {"blocks": []})
+    if name is not None:
+        entry.setdefault("name", name)
+    entry["blocks"].append(block_id)
+
+
+def _scan_primitive(index, value, block_id):
+    if isinstance(value, list) and len(value) >= 3 and value[0] in PRIMITIVE_REFS:
+        _add(index, PRIMITIVE_REFS[value[0]], value[2], block_id, value[1])
+
+
+def build_target_index(blocks):
+    """Collect opcode, variable, list, broadcast and custom block references.
+
+    Every entry maps an opcode / id / proccode to the ids of the blocks
+    that use it. ``procedures`` holds every block of a definition's
+    script, ``calls`` every block that calls it.
+    """
+    index = {kind: {} for kind in KINDS}
+
+    for block_id, block in blocks.items():
+        if isinstance(block, list):
+            # loose variable/list reporter on the canvas
+            _scan_primitive(index, block, block_id)
+            continue
+        if not isinstance(block, dict):
+            continue
+
+        _add(index, "opcodes", block.get("opcode"), block_id)
+
+        for field_name, value in (block.get("fields") or {}).items():
+            kind = FIELD_REFS.get(field_name)
+            if kind and isinstance(value, list) and len(value) >= 2 and value[1] is not None:
+                _add(index, kind, value[1], block_id, value[0])
+
+        for value in (block.get("inputs") or {}).values():
+            if isinstance(value, list):
+                for item in value[1:]:
+                    _scan_primitive(index, item, block_id)
+
+        if block.get("opcode") == "procedures_call":
+            proccode = (block.get("mutation") or {}).get("proccode")
+            if proccode is not None:
+                _add(index, "calls", proccode, block_id)
+
+    # a definition owns every block in its script
+    definitions = {}
+    for block_id, block in blocks.items():
+        if isinstance(block, dict) and block.get("opcode") == "procedures_definition":
+            prototype_input = (block.get("inputs") or {}).get("custom_block")
+            prototype = blocks.get(prototype_input[1]) if isinstance(prototype_input, list) and len(prototype_input) > 1 else None
+            if isinstance(prototype, dict):
+                proccode = (prototype.get("mutation") or {}).get("proccode")
+                if proccode is not None:
+                    definitions[block_id] = proccode
+    if definitions:
+        for block_id, root in find_roots(blocks).items():
+            if root in definitions:
+                _add(index, "procedures", definitions[root], block_id)
+
+    return index
+
+
+def index_document(targets):
+    # sorted so convert and compile write the same bytes for the same project
+    return {"version": INDEX_VERSION, "targets": dict(sorted(targets.items()))}
+
+
+def write_index(path, targets):
+    """Write the project index; returns False if it was already up to date."""
+    text = serialize.dumps(index_document(targets))
+    path = Path(path)
+    if path.exists() and path.read_text(encoding="utf-8") == text:
+        return False
+    path.write_text(text, encoding="utf-8")
+    profiling.wrote(len(text))
+    return True
+
+
+def load_index(prj_home):
+    path = Path(prj_home) / BLOCK_INDEX_NAME
+    if not path.exists():
+        raise FileNotFoundError(f"{path} not found, run convert or compile first")
+    data = serialize.load_path(path)
+    if data.get("version") != INDEX_VERSION:
+        raise ValueError(f"{path} was written by another version, run convert or compile again")
+    return data["targets"]
+
+
+def query(targets, kind, key):
+    """Find ``key`` (an opcode, id, name or proccode) in every target.
+
+    Returns ``{target name: [block ids]}`` for the targets that use it.
+    Variables, lists and broadcasts match on id first, then on name.
+    """
+    found = {}
+    for name, index in targets.items():
+        entries = index.get(kind, {})
+        entry = entries.get(key)
+        if entry is None and kind in ("variables", "lists", "broadcasts"):
+            matches = [e for e in entries.values() if e.get("name") == key]
+            if matches:
+                entry = {"blocks": [b for e in matches for b in e["blocks"]]}
+        if entry is not None and entry["blocks"]:
+            found[name] = entry["blocks"]
+    return found
@@ -0,0 +1,125 @@
+import hashlib
+from itertools import islice
+from pathlib import Path
+
+from ..serialize import serialize
+
+SCRIPTS_DIR = "scripts"
+INDEX_NAME = "index.json"
+
+
+def find_roots(blocks):
+    """Map every block id to the id of the top level block of its chain.
+
+    Primitive reporters stored as lists (loose variables/lists on the
+    canvas) are their own root, and so is a block whose parent is missing.
+    """
+    roots = {}
+    for block_id in blocks:
+        path = []
+        current = block_id
+        while current not in roots:
+            path.append(current)
+            block = blocks.get(current)
+            parent = block.get("parent") if isinstance(block, dict) else None
+            if parent is None or parent not in blocks or parent in path:
+                roots[current] = current
+                break
+            current = parent
+        root = roots[current]
+        for seen in path:
+            roots[seen] = root
+    return roots
+
+
+def split_blocks(blocks):
+    """Group a target's ``blocks`` dict into one dict per top level script.
+
+    Scripts come out in the order their root block appears, and blocks keep
+    their original order inside each script.
+    """
+    roots = find_roots(blocks)
+    scripts = {}
+    for block_id, block in blocks.items():
+        scripts.setdefault(roots[block_id], {})[block_id] = block
+    # order scripts by where their root sits in the original dict
+    order = {block_id: i for i, block_id in enumerate(blocks)}
+    return dict(sorted(scripts.items(), key=lambda item: order[item[0]]))
+
+
+def script_file_name(root_id):
+    # block ids can hold any character, so name files by a hash of the id
+    return hashlib.sha1(root_id.encode("utf-8")).hexdigest()[:16] + ".json"
+
+
+def block_order(scripts, blocks):
+    """How ``blocks`` interleaves ``scripts``, as ``[root id, count]`` runs.
+
+    None when the blocks are simply one script after another, which is
+    what ``join_scripts`` rebuilds without help.
+    """
+    if [block_id for script in scripts.values() for block_id in script] == list(blocks):
+        return None
+    root_of = {block_id: root_id for root_id, script in scripts.items() for block_id in script}
+    runs = []
+    for block_id in blocks:
+        root_id = root_of[block_id]
+        if runs and runs[-1][0] == root_id:
+            runs[-1][1] += 1
+        else:
+            runs.append([root_id, 1])
+    return runs
+
+
+def build_index(scripts, blocks=None):
+    """index.json for ``scripts``; pass the ``blocks`` they were split from
+    so joining them again gives the blocks back in the same order."""
+    index = []
+    for root_id, script in scripts.items():
+        root = script[root_id]
+        index.append({
+            "id": root_id,
+            "file": script_file_name(root_id),
+            "opcode": root.get("opcode") if isinstance(root, dict) else None,
+            "blocks": len(script),
+        })
+    doc = {"scripts": index}
+    order = block_order(scripts, blocks) if blocks is not None else None
+    if order is not None:
+        doc["order"] = order
+    return doc
+
+
+def has_split_scripts(target_dir):
+    return (Path(target_dir) / SCRIPTS_DIR / INDEX_NAME).exists()
+
+
+def load_index(target_dir):
+    return serialize.load_path(Path(target_dir) / SCRIPTS_DIR / INDEX_NAME)
+
+
+def load_script(target_dir, root_id):
+    """Load the blocks of a single script without touching the others."""
+    return serialize.load_path(Path(target_dir) / SCRIPTS_DIR / script_file_name(root_id))
+
+
+def join_scripts(target_dir):
+    """Rebuild the full ``blocks`` dict from a split scripts/ folder, in the
+    order they were split from."""
+    scripts_dir = Path(target_dir) / SCRIPTS_DIR
+    index = load_index(target_dir)
+    blocks = {}
+    if "order" not in index:
+        for entry in index["scripts"]:
+            blocks.update(serialize.load_path(scripts_dir / entry["file"]))
+        return blocks
+
+    scripts = {entry["id"]: iter(serialize.load_path(scripts_dir / entry["file"]).items())
+               for entry in index["scripts"]}
+    for root_id, count in index["order"]:
+        # a script edited by hand may have fewer blocks, or be gone
+        blocks.update(islice(scripts.get(root_id, ()), count))
+    # and more blocks than the order covers
+    for script in scripts.values():
+        blocks.update(script)
+    return blocks
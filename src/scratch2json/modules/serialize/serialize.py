@@ -0,0 +1,88 @@
+import json
+import math
+from pathlib import Path
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def backend():
+    return "orjson" if orjson is not None else "json"
+
+
+def loads(data):
+    """Parse JSON from ``str`` or ``bytes`` with the fastest backend around."""
+    if orjson is not None:
+        try:
+            return orjson.loads(data)
+        except orjson.JSONDecodeError:
+            # stdlib also accepts NaN/Infinity, which Scratch sometimes writes
+            pass
+    return json.loads(data)
+
+
+def load(f):
+    return loads(f.read())
+
+
+def load_path(path):
+    with open(path, "rb") as f:
+        return loads(f.read())
+
+
+def load_index(path, version, key):
+    """``key`` of an index written by ``save_index``, or ``{}`` when the
+    file is missing, unreadable or from another ``version``."""
+    try:
+        index = load_path(path)
+    except (OSError, ValueError):
+        return {}
+    if not isinstance(index, dict) or index.get("version") != version:
+        return {}
+    return index.get(key, {})
+
+
+def save_index(path, version, key, data):
+    """Write ``data`` under ``key`` along with ``version``, for ``load_index``."""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"version": version, key: data}, f, indent=4, sort_keys=True)
+
+
+def _finite(obj):
+    """False if ``obj`` holds a NaN or infinite float anywhere."""
+    stack = [obj]
+    while stack:
+        value = stack.pop()
+        if isinstance(value, float):
+            if not math.isfinite(value):
+                return False
+        elif isinstance(value, dict):
+            stack.extend(value.values())
+        elif isinstance(value, (list, tuple)):
+            stack.extend(value)
+    return True
+
+
+def dumps(obj, compact=False, ensure_ascii=True):
+    """Serialize ``obj`` to text.
+
+    Pretty output always goes through stdlib json with ``indent=4`` so the
+    structured folder stays byte-for-byte stable whichever backend is
+    installed (orjson can only indent by two). Compact output uses orjson
+    when it can; orjson writes NaN and Infinity as null, so data holding
+    them goes through stdlib json like the pretty output does.
+    """
+    if not compact:
+        return json.dumps(obj, indent=4, ensure_ascii=ensure_ascii)
+
+    if orjson is not None and not ensure_ascii and _finite(obj):
+        try:
+            return orjson.dumps(obj).decode("utf-8")
+        except (orjson.JSONEncodeError, TypeError):
+            # e.g. integers wider than 64 bits
+            pass
+    return json.dumps(obj, separators=(",", ":"), ensure_ascii=ensure_ascii)
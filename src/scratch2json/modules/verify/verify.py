@@ -0,0 +1,179 @@
+import hashlib
+import mmap
+import os
+from pathlib import Path
+
+from ..serialize import serialize
+from ..workers.workers import imap_ordered
+
+# bump whenever what gets stored per file changes, so old entries miss
+VERIFY_VERSION = 1
+
+# files at least this big are hashed through mmap instead of read()
+MMAP_THRESHOLD = 1024 * 1024
+
+
+def md5_file(path):
+    size = os.path.getsize(path)
+    with open(path, "rb") as f:
+        if size < MMAP_THRESHOLD:
+            return hashlib.md5(f.read()).hexdigest()
+        # hashlib drops the GIL on big buffers, so threads hash in parallel
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            return hashlib.md5(mm).hexdigest()
+
+
+class HashCache:
+    """md5 of every file verified before, valid while its size and mtime are.
+
+    Lives in ``builddir/.verified.json`` next to the compile caches.
+    """
+
+    def __init__(self, prj_home):
+        self.prj_home = Path(prj_home)
+        self.path = self.prj_home / "builddir" / ".verified.json"
+        self.files = serialize.load_index(self.path, VERIFY_VERSION, "files")
+        self.hits = 0
+        self.misses = 0
+
+    def lookup(self, rel, st):
+        entry = self.files.get(rel)
+        if entry and entry["size"] == st.st_size and entry["mtime_ns"] == st.st_mtime_ns:
+            self.hits += 1
+            return entry["md5"]
+        return None
+
+    def store(self, rel, st, md5):
+        self.misses += 1
+        self.files[rel] = {"size": st.st_size, "mtime_ns": st.st_mtime_ns, "md5": md5}
+
+    def save(self, seen):
+        # forget files that are gone, so the cache does not grow forever
+        self.files = {rel: entry for rel, entry in self.files.items() if rel in seen}
+        try:
+            serialize.save_index(self.path, VERIFY_VERSION, "files", self.files)
+        except OSError:
+            # read-only checkouts can still be verified, just without a cache
+            pass
+
+
+def _load_config(path):
+    if not path.exists():
+        return []
+    with open(path, "r", encoding="utf-8") as f:
+        data = serialize.load(f)
+    return data if isinstance(data, list) else []
+
+
+def asset_folders(prj_home):
+    """(owner, folder, kind) for every folder a config.json lists assets in.
+
+    Same layout compile reads: the stage keeps its costumes next to
+    stage_meta.json, sprites keep them in ``costumes/``.
+    """
+    prj_home = Path(prj_home)
+    folders = []
+    stage_dir = prj_home / "stage"
+    if stage_dir.is_dir():
+        folders.append(("Stage", stage_dir, "costumes"))
+        folders.append(("Stage", stage_dir / "sounds", "sounds"))
+    sprites_dir = prj_home / "sprites"
+    if sprites_dir.is_dir():
+        for sprite_dir in sorted(d for d in sprites_dir.iterdir() if d.is_dir()):
+            name = sprite_dir.name.replace("_", "/")
+            folders.append((name, sprite_dir / "costumes", "costumes"))
+            folders.append((name, sprite_dir / "sounds", "sounds"))
+    if (prj_home / "fonts").is_dir():
+        folders.append(("fonts", prj_home / "fonts", "fonts"))
+    return folders
+
+
+def collect_references(prj_home):
+    """Every asset the configs point at, as dicts with owner, md5ext,
+    assetId and the file it resolves to (None if there is none)."""
+    prj_home = Path(prj_home)
+    refs = []
+    for owner, folder, kind in asset_folders(prj_home):
+        for item in _load_config(folder / "config.json"):
+            if not isinstance(item, dict) or "md5ext" not in item:
+                continue
+            md5ext = item["md5ext"]
+            path = folder / md5ext
+            if not path.is_file():
+                # shared layout keeps the file once in assets/
+                path = prj_home / "assets" / md5ext
+            refs.append({
+                "owner": owner,
+                "kind": kind,
+                "md5ext": md5ext,
+                "assetId": item.get("assetId", Path(md5ext).stem),
+                "path": path if path.is_file() else None,
+            })
+    return refs
+
+
+def stored_files(prj_home):
+    """Every file that could be an asset: non-JSON files in asset folders
+    and in the shared ``assets/`` folder."""
+    prj_home = Path(prj_home)
+    folders = [folder for _, folder, _ in asset_folders(prj_home)] + [prj_home / "assets"]
+    files = set()
+    for folder in folders:
+        if not folder.is_dir():
+            continue
+        for entry in os.scandir(folder):
+            if entry.is_file() and not entry.name.endswith(".json"):
+                files.add(Path(entry.path))
+    return files
+
+
+def verify_project(prj_home, jobs=None, use_cache=True):
+    """Check a structured project's assets; returns a report dict.
+
+    ``dangling`` are referenced but missing, ``mismatched`` do not hash to
+    their assetId, ``orphaned`` are stored but referenced by nothing.
+    """
+    prj_home = Path(prj_home)
+    jobs = jobs or os.cpu_count() or 1
+    refs = collect_references(prj_home)
+    cache = HashCache(prj_home) if use_cache else None
+
+    paths = sorted({ref["path"] for ref in refs if ref["path"] is not None})
+
+    def hash_one(path):
+        rel = path.relative_to(prj_home).as_posix()
+        st = path.stat()
+        md5 = cache.lookup(rel, st) if cache else None
+        if md5 is None:
+            md5 = md5_file(path)
+            if cache:
+                cache.store(rel, st, md5)
+        return md5
+
+    hashes = dict(zip(paths, imap_ordered(hash_one, paths, jobs)))
+    if cache:
+        cache.save({path.relative_to(prj_home).as_posix() for path in paths})
+
+    report = {
+        "project": str(prj_home),
+        "assets": len(refs),
+        "hashed": cache.misses if cache else len(paths),
+        "cached": cache.hits if cache else 0,
+        "dangling": [],
+        "mismatched": [],
+        "orphaned": [],
+    }
+    for ref in refs:
+        entry = {"owner": ref["owner"], "kind": ref["kind"], "md5ext": ref["md5ext"]}
+        if ref["path"] is None:
+            report["dangling"].append(entry)
+            continue
+        md5 = hashes[ref["path"]]
+        if md5 != ref["assetId"] or md5 != Path(ref["md5ext"]).stem:
+            report["mismatched"].append(dict(entry, assetId=ref["assetId"], md5=md5))
+
+    referenced = set(paths)
+    for path in sorted(stored_files(prj_home) - referenced):
+        report["orphaned"].append(path.relative_to(prj_home).as_posix())
+    report["ok"] = not (report["dangling"] or report["mismatched"] or report["orphaned"])
+    return report
@@ -0,0 +1,228 @@
+import ctypes
+import ctypes.util
+import errno
+import os
+import select
+import struct
+import sys
+import time
+from pathlib import Path
+
+from ..compile_project.cache import PROJECT_PARTS as WATCHED
+
+# see inotify(7)
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_ISDIR = 0x40000000
+IN_CLOEXEC = 0o2000000
+
+WATCH_MASK = (IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO
+              | IN_CREATE | IN_DELETE | IN_DELETE_SELF | IN_MOVE_SELF)
+EVENT = struct.Struct("iIII")
+
+
+def is_watched(root, path):
+    try:
+        rel = Path(path).relative_to(root)
+    except ValueError:
+        return False
+    return bool(rel.parts) and rel.parts[0] in WATCHED
+
+
+class InotifyWatcher:
+    """Reports changed paths under the watched parts of ``root`` via inotify."""
+
+    def __init__(self, root):
+        self.root = Path(root)
+        self.libc = ctypes.CDLL(ctypes.util.find_library("c") or None, use_errno=True)
+        self.fd = self.libc.inotify_init1(IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self.dirs = {}
+        try:
+            # the root itself, so a sprites/ or fonts/ folder created later is seen
+            self._add(self.root)
+            for name in WATCHED:
+                if (self.root / name).is_dir():
+                    self._add_tree(self.root / name)
+        except OSError:
+            self.close()
+            raise
+
+    def _add(self, path):
+        wd = self.libc.inotify_add_watch(self.fd, os.fsencode(path), WATCH_MASK)
+        if wd < 0:
+            err = ctypes.get_errno()
+            if err in (errno.ENOENT, errno.ENOTDIR):
+                # gone before we got to it, the parent's event covers it
+                return
+            # usually ENOSPC: out of watches, the caller falls back to polling
+            raise OSError(err, f"inotify_add_watch failed for {path}")
+        self.dirs[wd] = Path(path)
+
+    def _add_tree(self, path):
+        self._add(path)
+        for dirpath, dirnames, _ in os.walk(path):
+            for name in dirnames:
+                self._add(Path(dirpath) / name)
+
+    def wait(self, timeout=None):
+        """Block up to ``timeout`` seconds and return the set of changed paths."""
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return set()
+
+        data = os.read(self.fd, 64 * 1024)
+        changed = set()
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, length = EVENT.unpack_from(data, offset)
+            offset += EVENT.size
+            name = data[offset:offset + length].rstrip(b"\0")
+            offset += length
+
+            if mask & IN_Q_OVERFLOW:
+                # events were dropped, so treat everything as changed
+                changed.update(self.root / part for part in WATCHED)
+                continue
+            folder = self.dirs.get(wd)
+            if folder is None:
+                continue
+            path = folder / os.fsdecode(name) if name else folder
+            if folder == self.root and not is_watched(self.root, path):
+                continue
+            changed.add(path)
+            if mask & IN_ISDIR and mask & (IN_CREATE | IN_MOVED_TO):
+                self._add_tree(path)
+        return changed
+
+    def close(self):
+        if self.fd >= 0:
+            os.close(self.fd)
+            self.fd = -1
+
+
+class PollingWatcher:
+    """Finds changed paths by comparing size and mtime snapshots.
+
+    Only the watched parts of ``root`` are scanned, and ``os.scandir`` keeps
+    it to one stat per file.
+    """
+
+    def __init__(self, root, interval=0.5):
+        self.root = Path(root)
+        self.interval = interval
+        self.snapshot = self._scan()
+
+    def _scan(self):
+        snapshot = {}
+        todo = [self.root / name for name in WATCHED]
+        while todo:
+            path = todo.pop()
+            try:
+                if path.is_file():
+                    st = path.stat()
+                    snapshot[path] = (st.st_size, st.st_mtime_ns)
+                    continue
+                entries = os.scandir(path)
+            except OSError:
+                continue
+            with entries:
+                for entry in entries:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            todo.append(Path(entry.path))
+                        else:
+                            st = entry.stat()
+                            snapshot[Path(entry.path)] = (st.st_size, st.st_mtime_ns)
+                    except OSError:
+                        continue
+        return snapshot
+
+    def wait(self, timeout=None):
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            delay = self.interval
+            if deadline is not None:
+                delay = min(delay, max(0, deadline - time.monotonic()))
+            time.sleep(delay)
+
+            snapshot = self._scan()
+            changed = {p for p in snapshot.keys() | self.snapshot.keys()
+                       if snapshot.get(p) != self.snapshot.get(p)}
+            self.snapshot = snapshot
+            if changed or (deadline is not None and time.monotonic() >= deadline):
+                return changed
+
+    def close(self):
+        pass
+
+
+def make_watcher(root, poll=False, interval=0.5):
+    if not poll and sys.platform.startswith("linux"):
+        try:
+            return InotifyWatcher(root)
+        except (OSError, AttributeError) as e:
+            # no inotify on this platform, or out of watches
+            print(f"inotify unavailable ({e}), polling instead")
+    return PollingWatcher(root, interval)
+
+
+def describe(root, changed):
+    """Name the targets (or other parts) a set of changed paths belongs to."""
+    parts = set()
+    for path in changed:
+        rel = Path(path).relative_to(root).parts
+        if rel[0] == "sprites" and len(rel) > 1:
+            parts.add(f"sprite '{rel[1]}'")
+        else:
+            parts.add(rel[0])
+    return ", ".join(sorted(parts))
+
+
+def watch(src, dst, compiler, meta_data=None, debounce=0.3, poll=False, interval=0.5):
+    """Rebuild ``dst`` from ``src`` every time the structured project changes.
+
+    A burst of writes (a git checkout, an editor saving several files) is
+    collected until nothing changed for ``debounce`` seconds, then built
+    once. ``compiler`` keeps its build cache, so only the targets whose
+    files changed are parsed again. Runs until interrupted.
+    """
+    root = Path(src)
+    watcher = make_watcher(root, poll, interval)
+    print(f"Watching {root} with {type(watcher).__name__}")
+
+    def build():
+        try:
+            compiler.reconstruct(structured_project_path=src, output_dir=dst, meta_data=meta_data)
+        except Exception as e:
+            # a half-saved file shouldn't end the session, the next save retries
+            print(f"Build failed: {e}")
+
+    build()
+    try:
+        while True:
+            changed = watcher.wait(None)
+            while True:
+                more = watcher.wait(debounce)
+                if not more:
+                    break
+                changed |= more
+
+            changed = {path for path in changed if is_watched(root, path)}
+            if not changed:
+                continue
+            print(f"\nChanged: {describe(root, changed)}")
+            build()
+    except KeyboardInterrupt:
+        print("\nStopped watching")
+    finally:
+        watcher.close()
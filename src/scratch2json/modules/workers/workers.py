@@ -0,0 +1,84 @@
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from ..profiling import profiling
+
+
+class AssetPool:
+    """Runs asset copies on a thread pool.
+
+    With ``jobs=1`` every task runs inline as soon as it is submitted. With
+    more jobs tasks run concurrently, but messages and errors are still
+    reported in the order the tasks were submitted. Submitting the same
+    call (or the same ``key``, usually the destination file) twice only runs
+    it once, so two workers never write the same file at the same time.
+    """
+
+    def __init__(self, jobs=1):
+        self.jobs = max(1, int(jobs or 1))
+        self.executor = ThreadPoolExecutor(self.jobs) if self.jobs > 1 else None
+        self.pending = []
+        self.submitted = set()
+
+    def submit(self, fn, *args, msg=None, key=None):
+        if key is None:
+            key = (fn, args)
+        if key in self.submitted:
+            return None
+        self.submitted.add(key)
+
+        if self.executor is not None:
+            future = self.executor.submit(fn, *args)
+        else:
+            future = Future()
+            try:
+                future.set_result(fn(*args))
+            except Exception as e:
+                future.set_exception(e)
+        self.pending.append((future, msg))
+        return future
+
+    def wait(self):
+        """Wait for every submitted task, then raise the first failure (if any)."""
+        pending, self.pending = self.pending, []
+        first_error = None
+        for future, msg in pending:
+            try:
+                future.result()
+            except Exception as e:
+                if first_error is None:
+                    first_error = e
+                continue
+            if msg:
+                profiling.item(msg)
+
+        if first_error is not None:
+            raise first_error
+
+    def close(self):
+        if self.executor is not None:
+            self.executor.shutdown(wait=True)
+            self.executor = None
+
+
+def imap_ordered(fn, items, jobs=1, window=None):
+    """Like ``map`` but runs ``fn`` on a thread pool, yielding in input order.
+
+    At most ``window`` calls (default ``2 * jobs``) are in flight, so results
+    that hold file contents never pile up in memory.
+    """
+    jobs = max(1, int(jobs or 1))
+    if jobs == 1:
+        for item in items:
+            yield fn(item)
+        return
+
+    window = window or jobs * 2
+    with ThreadPoolExecutor(jobs) as executor:
+        in_flight = deque()
+        for item in items:
+            in_flight.append(executor.submit(fn, item))
+            if len(in_flight) >= window:
+                yield in_flight.popleft().result()
+        while in_flight:
+            yield in_flight.popleft().result()
@@ -0,0 +1,90 @@
+import io
+import struct
+import zipfile
+
+import pytest
+
+from scratch2json.modules.compile_project.archive import write_archive
+
+
+def test_reuse_skips_member_edited_in_place(tmp_path):
+    svg = tmp_path / "costume.svg"
+    svg.write_bytes(b"<svg>aaaa</svg>")
+    write_archive(tmp_path / "old.sb3", {"costume.svg": svg})
+
+    # same name and size, different bytes
+    svg.write_bytes(b"<svg>bbbb</svg>")
+    reused = write_archive(tmp_path / "new.sb3", {"costume.svg": svg}, previous=tmp_path / "old.sb3")
+
+    assert reused == 0
+    with zipfile.ZipFile(tmp_path / "new.sb3") as zf:
+        assert zf.read("costume.svg") == b"<svg>bbbb</svg>"
+
+
+PNG = b"\x89PNG\r\n\x1a\n" + bytes(range(256)) * 8
+SVG = b"<svg>" + b"<g/>" * 500 + b"</svg>"
+# extended timestamp field, as written by Info-ZIP
+EXTRA = struct.pack("<HHBI", 0x5455, 5, 1, 1700000000)
+
+
+class Unseekable(io.RawIOBase):
+    """Forces zipfile to write data descriptors, like a streamed upload."""
+
+    def __init__(self, f):
+        self.f = f
+
+    def writable(self):
+        return True
+
+    def write(self, b):
+        return self.f.write(b)
+
+
+def _sources(tmp_path):
+    (tmp_path / "a.png").write_bytes(PNG)
+    (tmp_path / "b.svg").write_bytes(SVG)
+    return {"project.json": b"{}", "a.png": tmp_path / "a.png", "b.svg": tmp_path / "b.svg"}
+
+
+def _previous(path, extra=b"", stream=False):
+    with open(path, "wb") as f:
+        with zipfile.ZipFile(Unseekable(f) if stream else f, "w") as zf:
+            zf.writestr("project.json", b"{}")
+            for name, data, compress_type in (("a.png", PNG, zipfile.ZIP_STORED),
+                                              ("b.svg", SVG, zipfile.ZIP_DEFLATED)):
+                info = zipfile.ZipInfo(name, date_time=(2020, 1, 1, 0, 0, 0))
+                info.compress_type = compress_type
+                info.extra = extra
+                zf.writestr(info, data)
+
+
+@pytest.mark.parametrize("extra", [b"", EXTRA])
+@pytest.mark.parametrize("stream", [False, True])
+@pytest.mark.parametrize("deterministic", [False, True])
+def test_reused_members_read_back(tmp_path, extra, stream, deterministic):
+    members = _sources(tmp_path)
+    _previous(tmp_path / "old.sb3", extra, stream)
+
+    reused = write_archive(tmp_path / "new.sb3", members, previous=tmp_path / "old.sb3",
+                           deterministic=deterministic)
+
+    assert reused == 2
+    with zipfile.ZipFile(tmp_path / "new.sb3") as zf:
+        assert zf.testzip() is None
+        assert zf.getinfo("a.png").compress_type == zipfile.ZIP_STORED
+        assert zf.getinfo("b.svg").compress_type == zipfile.ZIP_DEFLATED
+        assert zf.read("a.png") == PNG
+        assert zf.read("b.svg") == SVG
+        assert zf.read("project.json") == b"{}"
+
+
+def test_reused_archive_is_reused_again(tmp_path):
+    members = _sources(tmp_path)
+    _previous(tmp_path / "old.sb3", EXTRA)
+    write_archive(tmp_path / "mid.sb3", members, previous=tmp_path / "old.sb3")
+
+    # a copy of a copy still has valid local headers to skip over
+    assert write_archive(tmp_path / "new.sb3", members, previous=tmp_path / "mid.sb3") == 2
+    with zipfile.ZipFile(tmp_path / "new.sb3") as zf:
+        assert zf.testzip() is None
+        assert zf.read("b.svg") == SVG
@@ -0,0 +1,64 @@
+import io
+import time
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip("flask")
+pytest.importorskip("flask_cors")
+
+from scratch2json.modules.backend.backend import app  # noqa: E402
+
+FIXTURE = Path(__file__).resolve().parent / "Test scratch2json"
+ASSETS = sorted(p.name for p in FIXTURE.iterdir() if p.name != "project.json")
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    monkeypatch.setenv("SCRATCH2JSON_BACKEND_DST", str(tmp_path / "prj"))
+    return app.test_client()
+
+
+def _delta(client, names):
+    data = {"project": (io.BytesIO((FIXTURE / "project.json").read_bytes()), "project.json")}
+    for name in names:
+        data[name] = (io.BytesIO((FIXTURE / name).read_bytes()), name)
+    return client.post("/api/upload/delta", data=data, content_type="multipart/form-data")
+
+
+def _finish(client, job_id, timeout=10):
+    deadline = time.time() + timeout
+    while True:
+        job = client.get(f"/api/jobs/{job_id}").get_json()
+        if job["status"] not in ("queued", "running"):
+            return job
+        assert time.time() < deadline, f"job {job_id} never finished"
+        time.sleep(0.02)
+
+
+def test_delta_upload_asks_for_missing_assets_then_converts(client, tmp_path):
+    # nothing stored yet: every asset is missing
+    response = _delta(client, [])
+    assert response.status_code == 409
+    assert response.get_json()["missing"] == ASSETS
+
+    response = _delta(client, ASSETS)
+    assert response.status_code == 202
+    assert response.get_json()["sent"] == len(ASSETS)
+    assert _finish(client, response.get_json()["job"])["status"] == "done"
+    assert (tmp_path / "prj" / "sprites" / "da penguin").is_dir()
+
+    # the next save only needs project.json
+    response = _delta(client, [])
+    assert response.status_code == 202
+    assert response.get_json()["sent"] == 0
+    assert _finish(client, response.get_json()["job"])["status"] == "done"
+
+
+def test_delta_upload_rejects_asset_with_wrong_md5(client):
+    data = {
+        "project": (io.BytesIO((FIXTURE / "project.json").read_bytes()), "project.json"),
+        ASSETS[0]: (io.BytesIO(b"not the asset"), ASSETS[0]),
+    }
+    response = client.post("/api/upload/delta", data=data, content_type="multipart/form-data")
+    assert response.status_code == 400
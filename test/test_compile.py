@@ -0,0 +1,47 @@
+import json
+import shutil
+from pathlib import Path
+
+import pytest
+
+from scratch2json.modules.compile_project.compile import ReconstructProject
+from scratch2json.modules.convert_project.convert_project import ConvertProject
+
+FIXTURES = Path(__file__).resolve().parent
+
+
+@pytest.fixture
+def prj(tmp_path):
+    rc = ConvertProject()
+    assert rc.convert(tmp_path / "prj", FIXTURES / "Test scratch2json", clear=True), rc.error
+    return tmp_path / "prj"
+
+
+def _edit(path, change):
+    data = json.loads(path.read_text(encoding="utf-8"))
+    change(data)
+    path.write_text(json.dumps(data), encoding="utf-8")
+
+
+@pytest.mark.parametrize("jobs", [1, 4])
+def test_two_targets_with_one_name_fail(tmp_path, prj, jobs):
+    shutil.copytree(prj / "sprites" / "Baseball", prj / "sprites" / "Baseball copy")
+    _edit(prj / "sprites" / "Baseball copy" / "sprite_meta.json", lambda meta: meta.update(name="Baseball"))
+
+    with pytest.raises(ValueError, match="more than one target is named 'Baseball'"):
+        ReconstructProject(jobs=jobs).reconstruct(prj, tmp_path / "out")
+
+
+@pytest.mark.parametrize("jobs", [1, 4])
+def test_broken_target_fails_with_every_problem(tmp_path, prj, jobs):
+    sprite = prj / "sprites" / "da penguin"
+    _edit(sprite / "sprite_meta.json", lambda meta: meta.update(currentCostume=3, variables=[]))
+    _edit(sprite / "sounds" / "config.json", lambda sounds: sounds[0].pop("assetId"))
+
+    with pytest.raises(ValueError) as e:
+        ReconstructProject(jobs=jobs).reconstruct(prj, tmp_path / "out")
+    message = str(e.value)
+    assert "da penguin" in message
+    assert "variables must be an object" in message
+    assert "sounds[0] has no assetId" in message
+    assert "currentCostume 3 is not one of its 1 costumes" in message
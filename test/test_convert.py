@@ -0,0 +1,60 @@
+import json
+import shutil
+from pathlib import Path
+
+import pytest
+
+from scratch2json.modules.convert_project.convert_project import ConvertProject
+
+FIXTURES = Path(__file__).resolve().parent
+SHARED_SOUND = "83a9787d4cb6f3b7632b4ddfebf74367.wav"
+
+
+@pytest.mark.parametrize("source", ["Test scratch2json", "Test scratch2json.pmp"])
+@pytest.mark.parametrize("stream", [False, True])
+def test_convert_reads_and_writes_each_file_once(tmp_path, source, stream):
+    rc = ConvertProject()
+    assert rc.convert(tmp_path / "prj", FIXTURES / source, clear=True, stream=stream), rc.error
+
+    assert rc.io.repeated() == {"reads": {}, "writes": {}}
+    assert rc.io.reads["project.json"] == 1
+    # two sprites use this sound: it is read once and copied to both
+    assert rc.io.reads[SHARED_SOUND] == 1
+    for sprite in ("Heart Face", "Baseball"):
+        assert (tmp_path / "prj" / "sprites" / sprite / "sounds" / SHARED_SOUND).is_file()
+
+
+@pytest.mark.parametrize("source", ["missing.sb3", "corrupt.sb3", "empty"])
+def test_convert_fails_before_touching_destination(tmp_path, source):
+    (tmp_path / "corrupt.sb3").write_bytes(b"not a zip")
+    (tmp_path / "empty").mkdir()
+    prj = tmp_path / "prj"
+
+    rc = ConvertProject()
+    assert not rc.convert(prj, tmp_path / source, clear=True)
+    assert rc.error is not None
+    assert not prj.exists()
+
+
+def test_incremental_convert_removes_deleted_sprite_only(tmp_path):
+    src = tmp_path / "src"
+    shutil.copytree(FIXTURES / "Test scratch2json", src)
+    prj = tmp_path / "prj"
+    assert ConvertProject().convert(prj, src, clear=True, incremental=True)
+    assert (prj / "sprites" / "Baseball").is_dir()
+
+    # files convert never wrote are the user's
+    (prj / "notes.md").write_text("todo", encoding="utf-8")
+    (prj / "builddir").mkdir(exist_ok=True)
+    (prj / "builddir" / "keep.txt").write_text("keep", encoding="utf-8")
+
+    project = json.loads((src / "project.json").read_text(encoding="utf-8"))
+    project["targets"] = [t for t in project["targets"] if t["name"] != "Baseball"]
+    (src / "project.json").write_text(json.dumps(project), encoding="utf-8")
+
+    rc = ConvertProject()
+    assert rc.convert(prj, src, clear=True, incremental=True), rc.error
+    assert not (prj / "sprites" / "Baseball").exists()
+    assert (prj / "sprites" / "Heart Face" / "sounds" / SHARED_SOUND).is_file()
+    assert (prj / "notes.md").read_text(encoding="utf-8") == "todo"
+    assert (prj / "builddir" / "keep.txt").is_file()
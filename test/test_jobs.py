@@ -0,0 +1,59 @@
+import io
+import threading
+import time
+
+from scratch2json.modules.backend.jobs import JobQueue
+
+
+def _wait(queue, job, timeout=5):
+    deadline = time.time() + timeout
+    while queue.get(job.id)["status"] in ("queued", "running"):
+        assert time.time() < deadline, f"job {job.id} never finished"
+        time.sleep(0.01)
+    return queue.get(job.id)
+
+
+def test_saves_for_the_same_destination_coalesce():
+    queue = JobQueue()
+    ran = []
+    started, release = threading.Event(), threading.Event()
+
+    def run(job):
+        ran.append(job.id)
+        if job.id == first.id:
+            started.set()
+            release.wait(5)
+
+    first = queue.submit("a", run)
+    # the worker is busy with the first save while the burst comes in
+    assert started.wait(5)
+    payloads = [io.BytesIO(b"x") for _ in range(3)]
+    burst = [queue.submit("a", run, payload) for payload in payloads]
+    other = queue.submit("b", run)
+    release.set()
+
+    latest = burst[-1]
+    assert _wait(queue, latest)["status"] == "done"
+    assert _wait(queue, other)["status"] == "done"
+    assert ran == [first.id, latest.id, other.id]
+    for job in burst[:-1]:
+        info = queue.get(job.id)
+        assert info["status"] == "superseded"
+        assert info["superseded_by"] == burst[burst.index(job) + 1].id
+    # every payload is closed once its job is done with it
+    assert all(payload.closed for payload in payloads)
+
+
+def test_failed_job_reports_error_and_queue_keeps_going():
+    queue = JobQueue()
+
+    def boom(job):
+        raise ValueError("bad project")
+
+    failed = queue.submit("a", boom)
+    after = queue.submit("b", lambda job: None)
+
+    info = _wait(queue, failed)
+    assert info["status"] == "failed"
+    assert info["error"] == "ValueError: bad project"
+    assert _wait(queue, after)["status"] == "done"
@@ -0,0 +1,121 @@
+import hashlib
+import json
+import struct
+import zipfile
+import zlib
+from pathlib import Path
+
+import pytest
+
+from scratch2json.modules.compile_project.compile import ReconstructProject
+from scratch2json.modules.convert_project.convert_project import ConvertProject
+from scratch2json.modules.optimize.optimize import OPTIMIZER_VERSION, PNG_SIGNATURE, _png_chunk
+from scratch2json.modules.serialize import serialize
+
+FIXTURES = Path(__file__).resolve().parent
+SPRITE = "da penguin"
+
+
+def _png():
+    pixels = b"".join(b"\0" + bytes([x * 16, 0, 255 - x * 16]) * 16 for x in range(16))
+    return b"".join([
+        PNG_SIGNATURE,
+        _png_chunk(b"IHDR", struct.pack(">IIBBBBB", 16, 16, 8, 2, 0, 0, 0)),
+        _png_chunk(b"tEXt", b"Software\0some paint program"),
+        # stored, not deflated, so recompressing it gains something
+        _png_chunk(b"IDAT", zlib.compress(pixels, 0)),
+        _png_chunk(b"IEND", b""),
+    ])
+
+
+def _wav():
+    fmt = struct.pack("<HHIIHH", 1, 1, 8000, 16000, 2, 16)
+    samples = bytes(range(200))
+    info = b"INFOISFT\x0e\x00\x00\x00some recorder\x00"
+    return b"RIFF" + struct.pack("<I", 4 + 8 + len(fmt) + 8 + len(info) + 8 + len(samples)) + b"WAVE" \
+        + b"fmt " + struct.pack("<I", len(fmt)) + fmt \
+        + b"LIST" + struct.pack("<I", len(info)) + info \
+        + b"data" + struct.pack("<I", len(samples)) + samples
+
+
+SVG = b'<svg xmlns="http://www.w3.org/2000/svg">\n  <!-- drawn by hand -->\n  <rect width="4" height="4"/>\n</svg>\n'
+
+
+def _add_asset(folder, data, ext, entry):
+    md5 = hashlib.md5(data).hexdigest()
+    (folder / f"{md5}.{ext}").write_bytes(data)
+    config = json.loads((folder / "config.json").read_text(encoding="utf-8"))
+    config.append(dict(entry, assetId=md5, md5ext=f"{md5}.{ext}", dataFormat=ext))
+    (folder / "config.json").write_text(json.dumps(config, indent=4), encoding="utf-8")
+    return f"{md5}.{ext}"
+
+
+@pytest.fixture
+def project(tmp_path):
+    prj = tmp_path / "prj"
+    rc = ConvertProject()
+    assert rc.convert(prj, FIXTURES / "Test scratch2json", clear=True), rc.error
+    sprite = prj / "sprites" / SPRITE
+    costume = {"bitmapResolution": 1, "rotationCenterX": 0, "rotationCenterY": 0}
+    added = [
+        _add_asset(sprite / "costumes", _png(), "png", dict(costume, name="bitmap", bitmapResolution=2)),
+        _add_asset(sprite / "costumes", SVG, "svg", dict(costume, name="vector")),
+        _add_asset(sprite / "sounds", _wav(), "wav", {"name": "tagged", "rate": 8000, "sampleCount": 100}),
+    ]
+    return prj, added
+
+
+def _pixels(png):
+    idat, pos = b"", len(PNG_SIGNATURE)
+    while pos < len(png):
+        length, kind = struct.unpack(">I4s", png[pos:pos + 8])
+        if kind == b"IDAT":
+            idat += png[pos + 8:pos + 8 + length]
+        pos += 12 + length
+    return zlib.decompress(idat)
+
+
+def _refs(project_json):
+    for target in project_json["targets"]:
+        for asset in target["costumes"] + target["sounds"]:
+            yield asset["assetId"], asset["md5ext"]
+
+
+@pytest.mark.parametrize("compact", [False, True])
+def test_optimized_assets_keep_refs_in_sync(tmp_path, project, compact):
+    prj, added = project
+    originals = {name: next(prj.rglob(name)).read_bytes() for name in added}
+
+    builds = []
+    for i in range(2):
+        # the second build is served from builddir/.optimized
+        out = tmp_path / f"out{i}"
+        ReconstructProject(compact=compact, deterministic=True, optimize=True).reconstruct(prj, out)
+        builds.append(Path(f"{out}.zip").read_bytes())
+    assert builds[0] == builds[1]
+
+    with zipfile.ZipFile(tmp_path / "out0.zip") as zf:
+        members = {name: zf.read(name) for name in zf.namelist()}
+    project_json = json.loads(members.pop("project.json"))
+
+    # every member is named by the md5 of the bytes it holds
+    for name, data in members.items():
+        assert hashlib.md5(data).hexdigest() == Path(name).stem, name
+    # and project.json points at exactly those members
+    refs = set(_refs(project_json))
+    assert {md5ext for _, md5ext in refs} == members.keys()
+    for asset_id, md5ext in refs:
+        assert asset_id == Path(md5ext).stem
+
+    index = serialize.load_index(prj / "builddir" / ".optimized" / "index.json", OPTIMIZER_VERSION, "assets")
+    png, svg, wav = (members[index[name]["md5ext"]] for name in added)
+    for name in added:
+        assert name not in members, f"{name} was not optimized"
+    assert b"tEXt" not in png
+    assert _pixels(png) == _pixels(_png())
+    assert b"<!--" not in svg
+    assert b"LIST" not in wav and wav.endswith(bytes(range(200)))
+
+    # the structured folder keeps the originals
+    for name, data in originals.items():
+        assert next(prj.rglob(name)).read_bytes() == data
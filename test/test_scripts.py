@@ -0,0 +1,30 @@
+import zipfile
+from pathlib import Path
+
+import pytest
+
+from scratch2json.modules.compile_project.compile import ReconstructProject
+from scratch2json.modules.convert_project.convert_project import ConvertProject
+from scratch2json.modules.scripts.scripts import SCRIPTS_DIR
+
+FIXTURES = Path(__file__).resolve().parent
+
+
+def _build(tmp_path, split_scripts, stream=False):
+    name = "split" if split_scripts else "single"
+    rc = ConvertProject(split_scripts=split_scripts)
+    assert rc.convert(tmp_path / name, FIXTURES / "Test scratch2json.pmp", clear=True, stream=stream), rc.error
+    ReconstructProject(deterministic=True).reconstruct(tmp_path / name, tmp_path / f"{name}-out")
+    with zipfile.ZipFile(tmp_path / f"{name}-out.zip") as zf:
+        return zf.read("project.json")
+
+
+@pytest.mark.parametrize("stream", [False, True])
+def test_split_scripts_compile_to_the_same_project_json(tmp_path, stream):
+    single = _build(tmp_path, split_scripts=False)
+    # da penguin's scripts are interleaved in its blocks dict
+    split = _build(tmp_path, split_scripts=True, stream=stream)
+
+    assert (tmp_path / "split" / "sprites" / "da penguin" / SCRIPTS_DIR).is_dir()
+    assert not (tmp_path / "split" / "sprites" / "da penguin" / "script.json").exists()
+    assert split == single
@@ -0,0 +1,37 @@
+import math
+
+import pytest
+
+from scratch2json.modules.serialize import serialize
+
+
+@pytest.mark.parametrize("ensure_ascii", [True, False])
+@pytest.mark.parametrize("value", [float("nan"), float("inf"), float("-inf")])
+def test_compact_and_pretty_keep_non_finite_floats(value, ensure_ascii):
+    data = {"v": value, "list": [1, [value]]}
+    compact = serialize.loads(serialize.dumps(data, compact=True, ensure_ascii=ensure_ascii))
+    pretty = serialize.loads(serialize.dumps(data, ensure_ascii=ensure_ascii))
+
+    for loaded in (compact, pretty):
+        assert loaded["v"] is not None and loaded["list"][1][0] is not None
+        if math.isnan(value):
+            assert math.isnan(loaded["v"]) and math.isnan(loaded["list"][1][0])
+        else:
+            assert loaded["v"] == value and loaded["list"][1][0] == value
+
+
+def test_compact_matches_pretty_for_finite_data():
+    data = {"targets": [{"name": "Sprite1", "x": 1.5, "blocks": {"a": {"opcode": "looks_show"}}}], "n": None}
+    assert serialize.loads(serialize.dumps(data, compact=True, ensure_ascii=False)) == serialize.loads(serialize.dumps(data))
+
+
+def test_index_round_trip_and_version_miss(tmp_path):
+    path = tmp_path / "cache" / "index.json"
+    assert serialize.load_index(path, 1, "files") == {}
+
+    serialize.save_index(path, 1, "files", {"a": {"md5": "x"}})
+    assert serialize.load_index(path, 1, "files") == {"a": {"md5": "x"}}
+    # an index from another version, or a broken one, is just a miss
+    assert serialize.load_index(path, 2, "files") == {}
+    path.write_text("{not json", encoding="utf-8")
+    assert serialize.load_index(path, 1, "files") == {}